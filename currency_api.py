@@ -6,10 +6,24 @@ import logging
 logging.getLogger('streamlit').setLevel(logging.ERROR)
 KST = timezone(timedelta(hours=9))
 
-@st.cache_data(ttl=timedelta(minutes=10))
-def get_exchange_rates(symbols: list, base_currency: str = 'KRW') -> tuple[dict | None, datetime | None]:
+def filter_rates(all_rates: dict, symbols: list, base_currency: str = 'KRW') -> dict:
+    """전체 환율 중 필요한 통화(+ 비교용 USD, 기준 통화)만 골라 반환합니다."""
+    required_symbols = set(symbols)
+    required_symbols.add('USD') # 비교를 위해 USD는 항상 포함
+    required_symbols.add(base_currency)
+    
+    return {
+        symbol: rate 
+        for symbol, rate in all_rates.items() 
+        if symbol in required_symbols
+    }
+
+
+@st.cache_data(ttl=timedelta(minutes=10), max_entries=8)
+def get_exchange_rates(symbols: list | None, base_currency: str = 'KRW') -> tuple[dict | None, datetime | None]:
     """
     실시간 환율 정보와 최종 업데이트 시간을 API로부터 가져옵니다.
+    symbols가 None이면 필터링 없이 전체 환율을 반환합니다 (통화 목록을 알기 전에 미리 조회할 때).
     반환값: (환율 딕셔너리, 업데이트 시간 datetime 객체)
     """
     url = f"https://open.er-api.com/v6/latest/{base_currency}"
@@ -23,15 +37,7 @@ def get_exchange_rates(symbols: list, base_currency: str = 'KRW') -> tuple[dict
             last_update_unix = data.get("time_last_update_unix")
             last_update_dt = datetime.fromtimestamp(last_update_unix, tz=KST) if last_update_unix else None
 
-            required_symbols = set(symbols)
-            required_symbols.add('USD') # 비교를 위해 USD는 항상 포함
-            required_symbols.add(base_currency)
-            
-            filtered_rates = {
-                symbol: rate 
-                for symbol, rate in all_rates.items() 
-                if symbol in required_symbols
-            }
+            filtered_rates = all_rates if symbols is None else filter_rates(all_rates, symbols, base_currency)
             print(f"환율 정보 API 호출 성공! (기준: {base_currency})")
             return filtered_rates, last_update_dt
         else:
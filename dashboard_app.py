@@ -1,22 +1,52 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 from datetime import datetime, timedelta, timezone
-import boto3
 
 KST = timezone(timedelta(hours=9))
+# 키움증권 데이터 건너뛰기 옵션 (필요시) - dashboard_config import 시 프로세스당 한 번만 읽음
+from dashboard_config import SKIP_KIWOOM
+
+# 차트 색상 상수는 재실행마다 다시 만들지 않도록 import 모듈(프로세스당 한 번 실행)에 둡니다.
+from dashboard_config import MARKET_COLORS, DOMESTIC_PIE, OVERSEAS_PIE, STOCK_PIE
+# 보유 현황 표 포맷/스타일 함수도 같은 이유로 import 모듈에 둡니다.
+from dashboard_config import HOLDINGS_FORMATS, highlight_negative, fmt_krw
+
+# 수집된 자산 목록 중 대시보드가 사용하는 컬럼
+ASSET_COLUMNS = [
+    'account_label', 'market', 'asset_type', 'ticker', 'name', 'currency',
+    'quantity', 'avg_buy_price', 'current_price', 'eval_amount', 'profit_loss',
+]
+# 값의 종류가 적어 범주형(category)으로 다루는 컬럼
+CATEGORY_COLUMNS = ('account_label', 'currency', 'asset_type', 'market')
 
 st.set_page_config(layout="wide", page_title="통합 포트폴리오 대시보드")
 
 
-@st.cache_data(ttl=timedelta(minutes=10))
+@st.cache_resource
+def get_ssm_client():
+    """SSM 클라이언트는 생성 비용이 커서 프로세스당 한 번만 만듭니다."""
+    # boto3는 import 비용이 커서 비밀번호 조회가 처음 필요할 때만 로드
+    import boto3
+    return boto3.client("ssm", region_name="ap-northeast-2")
+
+
+@st.cache_data(ttl=timedelta(minutes=10), show_spinner=False)
+def _fetch_password():
+    """Parameter Store 조회 결과만 캐시합니다. 실패는 예외로 올려 캐시되지 않게 합니다."""
+    response = get_ssm_client().get_parameter(
+        Name="/stock-dashboard/DASHBOARD_PASSWORD",
+        WithDecryption=True
+    )
+    return response["Parameter"]["Value"]
+
+
 def get_password_from_aws():
     """AWS Parameter Store에서 비밀번호를 가져오기 (캐시 적용)."""
     try:
-        ssm = boto3.client("ssm", region_name="ap-northeast-2")
-        response = ssm.get_parameter(
-            Name="/stock-dashboard/DASHBOARD_PASSWORD",
-            WithDecryption=True
-        )
-        return response["Parameter"]["Value"]
+        return _fetch_password()
     except Exception as e:
         st.error(f"비밀번호를 불러올 수 없습니다: {e}")
         return None
@@ -25,6 +55,7 @@ def get_password_from_aws():
 @st.cache_resource
 def load_chart_dependencies():
     """인증 이후에만 무거운 시각화 라이브러리를 로드."""
+    import numpy as np
     import pandas as pd
     import plotly.express as px
     import plotly.graph_objects as go
@@ -38,7 +69,7 @@ def load_chart_dependencies():
         def _plotly_events(fig, key=None, click_event=True, **kwargs):
             return []
 
-    return pd, px, go, _plotly_events, plotly_events_available
+    return np, pd, px, go, _plotly_events, plotly_events_available
 
 
 def check_password():
@@ -96,7 +127,7 @@ def check_password():
 if not check_password():
     st.stop()
 
-pd, px, go, plotly_events, PLOTLY_EVENTS_AVAILABLE = load_chart_dependencies()
+np, pd, px, go, plotly_events, PLOTLY_EVENTS_AVAILABLE = load_chart_dependencies()
 
 st.markdown("""
 <style>
@@ -137,63 +168,412 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data(ttl=timedelta(minutes=5))
-def load_data():
-    import os
-    from stock import collect_all_assets
-    from currency_api import get_exchange_rates
+@st.cache_data(ttl=timedelta(minutes=5), max_entries=8, show_spinner=False)
+def _to_csv_bytes(frame):
+    """다운로드용 CSV 바이트 (엑셀 호환 utf-8-sig). 같은 표면 재직렬화하지 않습니다."""
+    return frame.to_csv(index=False).encode('utf-8-sig')
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _account_color_map(labels):
+    """계좌명 튜플 -> 차트 색상 dict. 계좌 구성이 같으면 재실행 시 캐시에서 바로 반환됩니다."""
+    color_map = {}
+    for account in labels:
+        if '조현익' in account:
+            color_map[account] = '#c7b273'
+        elif '뮤사이' in account:
+            if '키움' in account:
+                color_map[account] = '#BFBFBF'
+            elif '한투' in account:
+                color_map[account] = '#E5E5E5'
+            else:
+                color_map[account] = '#D3D3D3'
+        else:
+            color_map[account] = None
+    return color_map
+
 
-    # 키움증권 데이터 건너뛰기 옵션 (필요시)
-    skip_kiwoom = os.getenv("SKIP_KIWOOM", "false").lower() == "true"
+def add_krw_columns(df, exchange_rates_to_krw):
+    """eval/profit_loss/principal의 원화 환산 컬럼을 추가해 반환합니다.
+
+    DataFrame 엔진에 의존하는 변환을 이 함수 하나로 모아 두어, 변환 방식을 바꿀 때
+    load_data와 화면 코드는 건드리지 않도록 합니다.
+    """
+    # [핵심 수정] 모든 계산을 강제로 실수형(float)으로 변환하여 수행
+    # 이렇게 해야 '문자열'로 인식되어 합계가 안 구해지는 문제를 막을 수 있습니다.
+    # 행 단위 apply 대신 float 배열 연산(벡터화)으로 한 번에 계산합니다.
+    # 통화는 종류가 몇 개뿐이므로 범주형 코드로 작은 환율 배열(LUT)을 인덱싱합니다.
+    # LUT 끝에 기본값 1을 붙여 두어, 결측 통화(코드 -1)도 환율 1로 처리됩니다.
+    currency = pd.Categorical(df['currency'])
+    rate_lut = np.array(
+        [exchange_rates_to_krw.get(c, 1) for c in currency.categories] + [1], dtype=float
+    )
+    rate = rate_lut[currency.codes]
+    eval_amount = df['eval_amount'].to_numpy(dtype=float)
+    profit_loss = df['profit_loss'].to_numpy(dtype=float)
+    avg_buy_price = df['avg_buy_price'].to_numpy(dtype=float)
+    quantity = df['quantity'].to_numpy(dtype=float)
+
+    asset_type = df['asset_type'].to_numpy()
+    eval_krw = eval_amount * rate
+    profit_loss_krw = profit_loss * rate
+    principal_krw = np.where(
+        (asset_type == 'stock') & (avg_buy_price > 0),
+        avg_buy_price * quantity * rate,
+        eval_krw - profit_loss_krw,
+    )
+    # 예수금은 원금 = 평가금액 (df.loc 마스크 대입 대신 배열에서 바로 덮어씀)
+    is_cash = asset_type == 'cash'
+    principal_krw[is_cash] = eval_krw[is_cash]
+
+    df['eval_amount_krw'] = eval_krw
+    df['profit_loss_krw'] = profit_loss_krw
+    df['principal_krw'] = principal_krw
+    return df
+
+
+@st.cache_data(ttl=timedelta(minutes=5), max_entries=32)
+def summarize_by_account(frame):
+    """계좌별 평가금액 합계. 같은 계좌 필터로 재실행되면 캐시에서 바로 반환됩니다."""
+    return frame.groupby('account_label', observed=True)['eval_amount_krw'].sum().reset_index()
+
+
+@st.cache_data(ttl=timedelta(minutes=5), max_entries=32)
+def summarize_stocks(stock_only):
+    """종목(티커/종목명/통화)별 합계와 손익·수익률·비중을 평가금액 내림차순으로 반환합니다."""
+    stock_summary = stock_only.groupby(['ticker', 'name', 'currency'], observed=True).agg({
+        'eval_amount_krw': 'sum',
+        'principal_krw': 'sum',
+        'quantity': 'sum'
+    }).reset_index()
+    
+    stock_summary['profit_loss_krw'] = stock_summary['eval_amount_krw'] - stock_summary['principal_krw']
+    # 소수 첫째 자리 반올림은 표시 포맷('{:.1f}')이 처리하므로 별도 round 패스는 두지 않습니다.
+    # 원금이 0인 종목은 나눗셈을 건너뛰고 0%로 둡니다 (NaN 생성 후 fillna 하는 중간 배열 없음).
+    pl = stock_summary['profit_loss_krw'].to_numpy(dtype=float)
+    principal = stock_summary['principal_krw'].to_numpy(dtype=float)
+    profit_rate = np.divide(pl, principal, out=np.zeros_like(pl), where=principal != 0)
+    profit_rate *= 100
+    stock_summary['profit_rate'] = profit_rate
+    stock_summary['weight'] = stock_summary['eval_amount_krw'] / stock_summary['eval_amount_krw'].sum() * 100
     
-    # 1. 데이터 수집
-    assets_list = collect_all_assets(skip_kiwoom=skip_kiwoom)
-    last_updated = datetime.now(KST).strftime('%Y-%m-%d %H:%M:%S')
+    stock_summary = stock_summary.sort_values('eval_amount_krw', ascending=False).reset_index(drop=True)
+    return stock_summary
+
+
+@st.cache_data(ttl=timedelta(minutes=5), max_entries=64)
+def build_pie_figure(summary, names, title, color_map=None, colors=None):
+    """비중 파이 차트를 만들어 dict로 반환합니다.
+
+    입력(요약 DataFrame, 제목, 색상)이 같으면 재실행 시 Plotly 생성 과정을 건너뜁니다.
+    """
+    fig = px.pie(summary, names=names, values='eval_amount_krw', 
+                title=title, hole=0.35,
+                color=names if color_map else None,
+                color_discrete_map=color_map,
+                color_discrete_sequence=colors)
+    fig.update_traces(
+        textposition='inside', 
+        texttemplate='<b>%{label}</b><br>%{percent}',
+        textfont=dict(size=12, family='Arial')
+    )
+    fig.update_layout(
+        height=450, 
+        showlegend=True, 
+        legend=dict(
+            orientation="h",
+            yanchor="top",
+            y=-0.15,
+            xanchor="center",
+            x=0.5,
+            font=dict(size=10)
+        ),
+        margin=dict(l=10, r=10, t=50, b=80)
+    )
+    return fig.to_dict()
+
+
+@st.cache_data(ttl=timedelta(minutes=5), max_entries=64)
+def build_market_pie_figure(labels, values):
+    """국내/해외 비중 파이 차트를 dict로 반환합니다 (같은 라벨/값이면 캐시에서 반환)."""
+    colors = [MARKET_COLORS[label] for label in labels]
+    
+    fig = go.Figure(data=[go.Pie(
+        labels=labels,
+        values=values,
+        hole=0.35,
+        marker=dict(colors=colors),
+        textposition='inside',
+        texttemplate='<b>%{label}</b><br>%{percent}',
+        textfont=dict(size=12, family='Arial'),
+        hovertemplate='<b>%{label}</b><br>평가금액: ₩%{value:,.0f}<br>비중: %{percent}<extra></extra>'
+    )])
+    
+    fig.update_layout(
+        title={
+            'text': '국내/해외 비중',
+            'font': {'color': 'white'}
+        },
+        height=450,
+        showlegend=True,
+        legend=dict(
+            orientation="h",
+            yanchor="top",
+            y=-0.15,
+            xanchor="center",
+            x=0.5,
+            font=dict(size=10, color='white')
+        ),
+        margin=dict(l=10, r=10, t=50, b=80),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white')
+    )
+    return fig.to_dict()
+
+
+def build_market_detail_pie(top_stocks, pie_colors, market_name):
+    """시장 드릴다운 Top 10 파이 차트 (Streamlit 호출 없음 - 스레드에서 생성 가능)."""
+    fig_detail = px.pie(
+        top_stocks, 
+        names='display_name', 
+        values='eval_amount_krw',
+        title=f'{market_name} Top 10 종목',
+        hole=0.35,
+        color_discrete_sequence=pie_colors
+    )
+    fig_detail.update_traces(
+        textposition='inside',
+        texttemplate='<b>%{label}</b><br>%{percent}',
+        textfont=dict(size=12, family='Arial')
+    )
+    fig_detail.update_layout(
+        height=500,
+        showlegend=True,
+        legend=dict(
+            orientation="v",
+            yanchor="middle",
+            y=0.5,
+            xanchor="left",
+            x=1.05,
+            font=dict(size=10, family='Arial')
+        )
+    )
+    return fig_detail
+
+
+def build_market_detail_bar(top_stocks, market_stocks, account_color_map, market_name):
+    """시장 드릴다운 Top 10 계좌별 누적 막대 차트 (Streamlit 호출 없음 - 스레드에서 생성 가능)."""
+    fig_bar = go.Figure()
+    
+    for row in top_stocks.sort_values('eval_amount_krw', ascending=True).itertuples():
+        idx = row.Index
+        stock_name = row.display_name
+        stock_detail = market_stocks[
+            market_stocks['name'] == row.name
+        ]
+        
+        for account, amount in stock_detail[['account_label', 'eval_amount_krw']].itertuples(index=False):
+            
+            fig_bar.add_trace(go.Bar(
+                y=[stock_name],
+                x=[amount],
+                name=account,
+                orientation='h',
+                marker=dict(color=account_color_map.get(account) or '#1f77b4'),
+                text=f'₩{amount:,.0f}',
+                textposition='inside',
+                textfont=dict(size=10),
+                hovertemplate=f'<b>{account}</b><br>₩{amount:,.0f}<extra></extra>',
+                showlegend=True if idx == top_stocks.index[0] else False,
+                legendgroup=account
+            ))
+    
+    fig_bar.update_layout(
+        title=f'{market_name} Top 10 평가금액 (계좌별)',
+        height=500,
+        barmode='stack',
+        xaxis_title="평가금액 (원)",
+        yaxis_title="",
+        showlegend=True,
+        legend=dict(
+            title="계좌",
+            orientation="v",
+            yanchor="top",
+            y=1,
+            xanchor="left",
+            x=1.05,
+            font=dict(size=9, family='Arial')
+        ),
+        margin=dict(l=10, r=150, t=50, b=50)
+    )
+    return fig_bar
+
+# 자산 조회 결과는 5분 동안 그대로 쓰고, 15분까지는 이전 결과를 즉시 보여주면서 백그라운드에서 갱신
+ASSET_FRESH_TTL = timedelta(minutes=5)
+ASSET_STALE_LIMIT = timedelta(minutes=15)
+# 조회가 실패(예외 또는 빈 결과)하면 이 시간 동안은 다시 조회하지 않음 (토큰 발급 횟수 제한 대비)
+ASSET_RETRY_DELAY = ASSET_FRESH_TTL
+
+log = logging.getLogger("portfolio")
+
+
+def _collect_assets():
+    """증권사 API에서 자산 목록을 조회합니다 (Streamlit 호출 없음 - 백그라운드 스레드에서 실행)."""
+    from stock import collect_all_assets
+
+    return collect_all_assets(skip_kiwoom=SKIP_KIWOOM), datetime.now(KST)
+
+
+@st.cache_resource
+def _asset_refresher():
+    """프로세스 공용 자산 조회 상태: 마지막 성공 결과, 마지막 실패 시각, 진행 중인 조회(Future)."""
+    return {
+        "lock": threading.Lock(),
+        "executor": ThreadPoolExecutor(max_workers=1),
+        "future": None,
+        "last_good": None,
+        "failed_at": None,
+    }
+
+
+def reset_asset_cache():
+    """새로고침 버튼용: 마지막 결과와 실패 기록을 버려 다음 실행에서 새로 조회하게 합니다."""
+    state = _asset_refresher()
+    with state["lock"]:
+        state["last_good"] = None
+        state["failed_at"] = None
+
+
+def _settle_asset_fetch(state, future):
+    """끝난 조회 결과를 상태에 반영합니다 (호출 측에서 state["lock"] 보유).
+
+    같은 Future는 한 번만 반영하도록, 아직 진행 중인 조회로 등록된 경우에만 처리합니다.
+    """
+    if state["future"] is not future:
+        return
+    state["future"] = None
+    exc = future.exception()
+    if exc is None and future.result()[0]:
+        state["last_good"] = future.result()
+        state["failed_at"] = None
+        return
+    if exc is not None:
+        log.error("[자산 조회 오류] 증권사 자산 조회 실패", exc_info=exc)
+    state["failed_at"] = datetime.now(KST)
+
+
+def _begin_asset_fetch():
+    """원본 자산 목록 조회를 시작합니다 (stale-while-revalidate).
+
+    마지막 결과가 5분 이내면 그대로, 15분 이내면 그대로 반환하면서 백그라운드 갱신을 걸어 둡니다.
+    그보다 오래됐거나 결과가 없으면 (None, Future)를 반환하고, 호출자는 다른 일을 하다가
+    _wait_assets로 결과를 기다립니다. 동시에 여러 세션이 들어와도 조회는 한 번만 실행됩니다.
+    최근 ASSET_RETRY_DELAY 안에 조회가 실패했다면 새로 조회하지 않고, 이전 결과가 없으면
+    빈 결과([], 실패 시각)를 반환합니다.
+    """
+    state = _asset_refresher()
+    with state["lock"]:
+        future = state["future"]
+        if future is not None and future.done():
+            _settle_asset_fetch(state, future)
+
+        now = datetime.now(KST)
+        last_good = state["last_good"]
+        age = now - last_good[1] if last_good else None
+        if last_good and age < ASSET_FRESH_TTL:
+            return last_good, None
+
+        failed_at = state["failed_at"]
+        retry_blocked = failed_at is not None and now - failed_at < ASSET_RETRY_DELAY
+        if state["future"] is None and not retry_blocked:
+            state["future"] = state["executor"].submit(_collect_assets)
+        future = state["future"]
+
+        if last_good and age < ASSET_STALE_LIMIT:
+            return last_good, None
+        if future is None:
+            return ([], failed_at), None
+    return None, future
+
+
+def _wait_assets(future):
+    """진행 중인 자산 조회가 끝날 때까지 기다려 (자산 목록, 조회 시각)을 반환합니다.
+
+    조회 중 예외가 나면 이전 결과를, 없으면 빈 결과([], 현재 시각)를 반환합니다.
+    """
+    state = _asset_refresher()
+    try:
+        result = future.result()
+    except Exception:
+        result = None  # 예외 로그는 _settle_asset_fetch에서 남김
+    with state["lock"]:
+        _settle_asset_fetch(state, future)
+        if result is None:
+            result = state["last_good"] or ([], datetime.now(KST))
+    return result
+
+
+def load_data():
+    from currency_api import filter_rates, get_exchange_rates
+    from stock import assets_to_columns
+
+    # 1. 데이터 수집 시작 (이전 결과가 있으면 즉시, 없으면 백그라운드 조회)
+    ready, pending = _begin_asset_fetch()
+
+    # 2. 자산 조회가 진행되는 동안 환율을 조회합니다. 아직 통화 목록을 모르므로 전체 환율을
+    #    받아 두고(통화와 무관한 단일 캐시 키) 아래에서 보유 통화만 골라 씁니다.
+    all_rates, last_update_time = get_exchange_rates(symbols=None, base_currency='KRW')
+
+    if ready:
+        assets_list, fetched_at = ready
+    else:
+        with st.spinner("자산 수집 중..."):
+            assets_list, fetched_at = _wait_assets(pending)
+    last_updated = fetched_at.strftime('%Y-%m-%d %H:%M:%S')
     
     if not assets_list:
         st.error("API로부터 자산 정보를 가져오는 데 실패했습니다.")
         return pd.DataFrame(), {}, None, ""
 
-    df = pd.DataFrame(assets_list)
+    # 화면/계산에서 실제로 쓰는 컬럼만 골라 DataFrame을 만듭니다 (broker 등 미사용 컬럼 제외).
+    # 컬럼별 배열로 먼저 모아 행 dict마다의 dtype 추론을 건너뜁니다.
+    df = pd.DataFrame(assets_to_columns(assets_list, ASSET_COLUMNS))
 
-    # 2. 환율 정보 가져오기
+    # 보유 통화(+ USD, KRW) 환율만 남깁니다.
     symbols_in_data = df['currency'].unique().tolist()
-    rates, last_update_time = get_exchange_rates(symbols=symbols_in_data, base_currency='KRW')
+    rates = filter_rates(all_rates, symbols_in_data, 'KRW') if all_rates else None
 
     if not rates:
         st.warning("실시간 환율을 가져올 수 없어 기본 환율을 적용합니다.")
         rates = {'KRW': 1, 'USD': 0.000724, 'HKD': 0.005545}
     
-    exchange_rates_to_krw = {s: 1 / r if r != 0 else 0 for s, r in rates.items()}
-    exchange_rates_to_krw['KRW'] = 1
+    # 역수 환율은 작은 Series에서 한 번에 계산 (환율 0은 0으로 처리)
+    rates_s = pd.Series(rates, dtype='float64')
+    inverse_rates = (1.0 / rates_s.where(rates_s != 0)).fillna(0.0)
+    inverse_rates['KRW'] = 1.0
+    exchange_rates_to_krw = inverse_rates.to_dict()
     
-    # 3. [핵심 수정] 모든 계산을 강제로 실수형(float)으로 변환하여 수행
-    # 이렇게 해야 '문자열'로 인식되어 합계가 안 구해지는 문제를 막을 수 있습니다.
-    df['eval_amount_krw'] = df.apply(lambda r: float(r['eval_amount']) * exchange_rates_to_krw.get(r['currency'], 1), axis=1)
-    df['profit_loss_krw'] = df.apply(lambda r: float(r['profit_loss']) * exchange_rates_to_krw.get(r['currency'], 1), axis=1)
-    
-    df['principal_krw'] = df.apply(
-        lambda r: (float(r['avg_buy_price']) * float(r['quantity']) * exchange_rates_to_krw.get(r['currency'], 1))
-        if r['asset_type'] == 'stock' and float(r['avg_buy_price']) > 0 else (r['eval_amount_krw'] - r['profit_loss_krw']),
-        axis=1
-    )
-    df.loc[df['asset_type'] == 'cash', 'principal_krw'] = df['eval_amount_krw']
+    # 3. 원화 환산 컬럼 계산 (순수 함수로 분리)
+    df = add_krw_columns(df, exchange_rates_to_krw)
     
     # 4. [안전 장치] pandas의 숫자 변환 함수로 한 번 더 확실하게 처리
     df['eval_amount_krw'] = pd.to_numeric(df['eval_amount_krw'], errors='coerce').fillna(0)
     
-    # 5. 국가 정보 추가 (차트용)
-    def get_country(row):
-        if row['market'] == 'domestic':
-            return '🇰🇷 대한민국'
-        elif row['currency'] == 'USD':
-            return '🇺🇸 미국'
-        elif row['currency'] == 'HKD':
-            return '🇭🇰 홍콩'
-        else:
-            return '기타'
-            
-    df['country'] = df.apply(get_country, axis=1)
+    # 5. 국가 정보 추가 (차트용) - 매 실행마다 계산하므로 행 단위 apply 대신 np.select
+    market = df['market'].to_numpy()
+    currency = df['currency'].to_numpy()
+    df['country'] = np.select(
+        [market == 'domestic', currency == 'USD', currency == 'HKD'],
+        ['🇰🇷 대한민국', '🇺🇸 미국', '🇭🇰 홍콩'],
+        default='기타',
+    )
+    
+    # 6. 수량은 모든 증권사 파서가 정수로 만들므로 int64로 한 번만 고정 (표시 포맷이 정수 경로를 탐)
+    df['quantity'] = df['quantity'].astype('int64')
+    
+    # 7. 종류가 적은 문자열 컬럼은 범주형으로 변환 (groupby/필터가 정수 코드 비교로 동작)
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype('category')
     
     return df, exchange_rates_to_krw, last_update_time, last_updated
 
@@ -244,23 +624,21 @@ def calculate_twr(daily_nav_df, cashflow_df):
     if daily_nav_df.empty:
         return pd.DataFrame(), 0.0
 
-    nav_df = daily_nav_df.copy()
-    nav_df["date"] = pd.to_datetime(nav_df["date"]).dt.date
+    # assign/groupby 키로 날짜만 바꿔 쓰고 원본 프레임 전체를 복사하지 않습니다.
+    nav_df = daily_nav_df.assign(date=pd.to_datetime(daily_nav_df["date"]).dt.date)
     nav_df = nav_df.sort_values("date").reset_index(drop=True)
 
-    flow_df = cashflow_df.copy()
-    if not flow_df.empty:
-        flow_df["date"] = pd.to_datetime(flow_df["date"]).dt.date
-        flow_by_date = flow_df.groupby("date")["amount_krw"].sum().to_dict()
+    if not cashflow_df.empty:
+        flow_dates = pd.to_datetime(cashflow_df["date"]).dt.date
+        flow_by_date = cashflow_df["amount_krw"].groupby(flow_dates).sum().to_dict()
     else:
         flow_by_date = {}
 
     records = []
     cumulative = 1.0
     prev_nav = None
-    for _, row in nav_df.iterrows():
-        nav = float(row["total_nav_krw"])
-        d = row["date"]
+    for d, nav in nav_df[["date", "total_nav_krw"]].itertuples(index=False):
+        nav = float(nav)
         flow = float(flow_by_date.get(d, 0))
         if prev_nav is None or prev_nav <= 0:
             daily_ret = 0.0
@@ -307,7 +685,6 @@ def get_simple_benchmark_return(index_name, start_date, end_date):
 
 
 def load_nav_inputs_from_files():
-    import os
     nav_path = os.getenv("NAV_DAILY_FILE", "data/nav_daily.csv")
     flow_path = os.getenv("NAV_FLOW_FILE", "data/nav_cashflows.csv")
 
@@ -323,12 +700,253 @@ def load_nav_inputs_from_files():
 
 
 
+@st.fragment
+def render_corp_finance_tab(df):
+    """법인 재무현황 탭. 입력 위젯이 많아 fragment로 분리해 수정 시 이 탭만 다시 실행합니다."""
+    st.subheader("🏢 뮤사이(법인) 재무현황")
+    st.caption("상단은 약식 재무상태표/손익계산서만 표시하고, 수정은 하단 'Modify' 영역에서만 수행합니다.")
+    from stock import get_kis_collateral_loan_balance, load_creon_web_balance
+
+    report_date = st.date_input("기준일", value=datetime.now(KST).date(), key="corp_report_date")
+    # 계좌별 평가금액 합계(탭1과 같은 캐시)를 재사용합니다. 자산은 주식/예수금뿐이므로
+    # 계좌 합계가 곧 단기매매증권(주식+예수금) 평가액입니다.
+    account_totals = summarize_by_account(df)
+    musai_securities_krw = account_totals.loc[
+        account_totals["account_label"].str.contains("뮤사이", na=False), "eval_amount_krw"
+    ].sum()
+    creon_balance = load_creon_web_balance()
+    musai_securities_krw += float(creon_balance.get("eval_amount_krw", 0.0))
+    amort = calculate_copyright_amortization(report_date=report_date)
+
+    # 기본값(수정은 하단 Modify에서만)
+    defaults = {
+        "related_party_principal": 300_000_000,
+        "related_party_rate": 4.6,
+        "rcps_1_principal": 180_000_000,
+        "rcps_2_principal": 262_800_000,
+        "rcps_rate": 2.0,
+        "kibo_principal": 70_000_000,
+        "kibo_rate": 3.25,
+        "kosme_principal": 100_000_000,
+        "kosme_rate": 2.5,
+        "collateral_loan_rate": 5.5,
+        "sales": 32_376_011,
+        "opex": 72_326_973,
+        "interest_income": 9_635_962,
+        "dividend_income": 11_743_963,
+        "sec_gain": 88_348_971,
+        "sec_loss": 34_899_317,
+        "interest_expense": 20_465_270,
+    }
+    for k, v in defaults.items():
+        st.session_state.setdefault(f"corp_{k}", v)
+    st.session_state.setdefault("corp_kosme_start", datetime(report_date.year, 1, 1).date())
+
+    kis_loan_result = get_kis_collateral_loan_balance(prefix="C")
+    kis_collateral_loan_krw = float(kis_loan_result.get("loan_balance", 0.0))
+    st.session_state.setdefault("corp_kis_collateral_loan", kis_collateral_loan_krw)
+
+    related_party_principal = float(st.session_state["corp_related_party_principal"])
+    related_party_rate = float(st.session_state["corp_related_party_rate"])
+    rcps_1_principal = float(st.session_state["corp_rcps_1_principal"])
+    rcps_2_principal = float(st.session_state["corp_rcps_2_principal"])
+    rcps_rate = float(st.session_state["corp_rcps_rate"])
+    kibo_principal = float(st.session_state["corp_kibo_principal"])
+    kibo_rate = float(st.session_state["corp_kibo_rate"])
+    kosme_principal = float(st.session_state["corp_kosme_principal"])
+    kosme_rate = float(st.session_state["corp_kosme_rate"])
+    collateral_loan_rate = float(st.session_state["corp_collateral_loan_rate"])
+    kis_collateral_loan_krw = float(st.session_state["corp_kis_collateral_loan"])
+    sales_amount = float(st.session_state["corp_sales"])
+    opex_amount = float(st.session_state["corp_opex"])
+    interest_income = float(st.session_state["corp_interest_income"])
+    dividend_income = float(st.session_state["corp_dividend_income"])
+    sec_gain = float(st.session_state["corp_sec_gain"])
+    sec_loss = float(st.session_state["corp_sec_loss"])
+    interest_expense = float(st.session_state["corp_interest_expense"])
+
+    kosme = calculate_kosme_loan_schedule(
+        report_date=report_date,
+        principal=kosme_principal,
+        annual_rate=kosme_rate / 100,
+        amort_months=36,
+        repayment_start_date=st.session_state["corp_kosme_start"],
+    )
+
+    total_liabilities = (
+        related_party_principal
+        + kibo_principal
+        + kosme["remaining_principal"]
+        + rcps_1_principal
+        + rcps_2_principal
+        + kis_collateral_loan_krw
+    )
+    weighted_avg_rate = (
+        (related_party_principal * related_party_rate)
+        + (kibo_principal * kibo_rate)
+        + (kosme["remaining_principal"] * kosme_rate)
+        + (rcps_1_principal * rcps_rate)
+        + (rcps_2_principal * rcps_rate)
+        + (kis_collateral_loan_krw * collateral_loan_rate)
+    ) / max(total_liabilities, 1)
+
+    total_assets_est = musai_securities_krw + amort["net_book_value"]
+    equity_est = total_assets_est - total_liabilities
+
+    operating_profit = sales_amount - opex_amount
+    non_operating_income = interest_income + dividend_income + sec_gain
+    non_operating_expense = interest_expense + sec_loss
+    pretax_income = operating_profit + non_operating_income - non_operating_expense
+
+    st.markdown("### 📘 약식 재무상태표")
+    bs_table = pd.DataFrame([
+        {"구분": "자산", "항목": "단기매매증권(주식+예수금)", "금액": musai_securities_krw},
+        {"구분": "자산", "항목": "무형자산(저작권 순액)", "금액": amort["net_book_value"]},
+        {"구분": "자산", "항목": "자산총계", "금액": total_assets_est},
+        {"구분": "부채", "항목": "특수관계인 차입금", "금액": related_party_principal},
+        {"구분": "부채", "항목": "기보 대출", "금액": kibo_principal},
+        {"구분": "부채", "항목": "중진공 대출(잔액)", "금액": kosme["remaining_principal"]},
+        {"구분": "부채", "항목": "RCPS 조합1", "금액": rcps_1_principal},
+        {"구분": "부채", "항목": "RCPS 조합2", "금액": rcps_2_principal},
+        {"구분": "부채", "항목": "한투 증권담보대출", "금액": kis_collateral_loan_krw},
+        {"구분": "부채", "항목": "부채총계", "금액": total_liabilities},
+        {"구분": "자본", "항목": "자본(자산-부채)", "금액": equity_est},
+    ])
+    st.dataframe(bs_table.style.format({"금액": "₩{:,.0f}"}), hide_index=True, width='stretch')
+
+    st.markdown("### 📗 약식 손익계산서")
+    pl_df = pd.DataFrame([
+        {"항목": "매출액", "금액": sales_amount},
+        {"항목": "판매비와관리비", "금액": opex_amount},
+        {"항목": "영업손익", "금액": operating_profit},
+        {"항목": "이자수익", "금액": interest_income},
+        {"항목": "배당금수익", "금액": dividend_income},
+        {"항목": "단기매매증권처분이익", "금액": sec_gain},
+        {"항목": "이자비용", "금액": -interest_expense},
+        {"항목": "단기매매증권처분손실", "금액": -sec_loss},
+        {"항목": "법인세차감전이익(추정)", "금액": pretax_income},
+    ])
+    st.dataframe(pl_df.style.format({"금액": "₩{:,.0f}"}), hide_index=True, width='stretch')
+
+    st.markdown(f"**부채총계 가중평균 금리:** {weighted_avg_rate:.2f}%")
+    if kis_loan_result.get("success"):
+        st.caption(f"한투 담보대출 API 자동조회 성공: ₩{kis_collateral_loan_krw:,.0f}")
+    else:
+        st.caption("한투 담보대출 API 자동조회 실패. 하단 Modify에서 수동 보정하세요.")
+    if creon_balance.get("success"):
+        st.caption(
+            f"대신(크레온) 웹수집 반영: ₩{creon_balance.get('eval_amount_krw', 0):,.0f} "
+            f"(source: {creon_balance.get('path')}, updated: {creon_balance.get('last_updated')})"
+        )
+    else:
+        st.caption(f"대신(크레온) 웹수집 파일 미반영 (expected: {creon_balance.get('path')})")
+
+    with st.expander("⚙️ Modify (수정 입력)", expanded=False):
+        c1, c2, c3 = st.columns(3)
+        st.session_state["corp_related_party_principal"] = c1.number_input("특수관계인 차입금", min_value=0, value=int(related_party_principal), step=10_000_000)
+        st.session_state["corp_related_party_rate"] = c2.number_input("특수관계인 금리(%)", min_value=0.0, value=float(related_party_rate), step=0.1)
+        st.session_state["corp_rcps_rate"] = c3.number_input("RCPS 금리(%)", min_value=0.0, value=float(rcps_rate), step=0.1)
+
+        c4, c5, c6 = st.columns(3)
+        st.session_state["corp_rcps_1_principal"] = c4.number_input("RCPS 조합1", min_value=0, value=int(rcps_1_principal), step=10_000_000)
+        st.session_state["corp_rcps_2_principal"] = c5.number_input("RCPS 조합2", min_value=0, value=int(rcps_2_principal), step=10_000_000)
+        st.session_state["corp_kis_collateral_loan"] = c6.number_input("한투 증권담보대출", min_value=0, value=int(kis_collateral_loan_krw), step=10_000_000)
+
+        c7, c8, c9 = st.columns(3)
+        st.session_state["corp_kibo_principal"] = c7.number_input("기보 원금", min_value=0, value=int(kibo_principal), step=5_000_000)
+        st.session_state["corp_kibo_rate"] = c8.number_input("기보 금리(%)", min_value=0.0, value=float(kibo_rate), step=0.05)
+        st.session_state["corp_collateral_loan_rate"] = c9.number_input("증권담보대출 금리(%)", min_value=0.0, value=float(collateral_loan_rate), step=0.1)
+
+        c10, c11, c12 = st.columns(3)
+        st.session_state["corp_kosme_principal"] = c10.number_input("중진공 최초 원금", min_value=0, value=int(kosme_principal), step=10_000_000)
+        st.session_state["corp_kosme_rate"] = c11.number_input("중진공 금리(%)", min_value=0.0, value=float(kosme_rate), step=0.1)
+        st.session_state["corp_kosme_start"] = c12.date_input("중진공 상환 시작일", value=st.session_state["corp_kosme_start"], key="modify_kosme_start")
+
+        p1, p2, p3 = st.columns(3)
+        st.session_state["corp_sales"] = p1.number_input("매출액", min_value=0, value=int(sales_amount), step=1_000_000)
+        st.session_state["corp_opex"] = p2.number_input("판관비", min_value=0, value=int(opex_amount), step=1_000_000)
+        st.session_state["corp_interest_income"] = p3.number_input("이자수익", min_value=0, value=int(interest_income), step=100_000)
+
+        p4, p5, p6 = st.columns(3)
+        st.session_state["corp_dividend_income"] = p4.number_input("배당금수익", min_value=0, value=int(dividend_income), step=100_000)
+        st.session_state["corp_sec_gain"] = p5.number_input("증권처분이익", min_value=0, value=int(sec_gain), step=100_000)
+        st.session_state["corp_sec_loss"] = p6.number_input("증권처분손실", min_value=0, value=int(sec_loss), step=100_000)
+        st.session_state["corp_interest_expense"] = st.number_input("이자비용", min_value=0, value=int(interest_expense), step=100_000)
+
+        st.caption("※ 수정값은 세션 기준으로 즉시 반영됩니다.")
+        st.caption("크레온(대신) COM은 서버 직접 자동화 제약이 커서 별도 로컬 수집 에이전트 연동이 필요합니다.")
+
+
+@st.fragment
+def render_nav_tab():
+    """통합 NAV/벤치마크 탭. 수동 입력 시 이 탭만 다시 실행합니다."""
+    st.subheader("📈 통합 NAV 및 벤치마크 비교")
+    st.caption("업로드 방식 대신, 스케줄러(CRON)로 누적 저장된 NAV/현금흐름 파일을 읽어 TWR을 계산합니다.")
+
+    nav_df, flow_df, nav_path, flow_path = load_nav_inputs_from_files()
+    st.caption(f"NAV 파일: `{nav_path}` | 현금흐름 파일: `{flow_path}`")
+    st.caption("※ 외화 환전은 외부 입출금이 아닌 내부 이동으로 간주하여 flow 파일에서 제외하세요.")
+
+    if nav_df.empty:
+        st.warning("NAV 스케줄 파일이 없거나 비어 있습니다. 먼저 CRON으로 일별 NAV를 적재해주세요.")
+    else:
+        required_nav_cols = {"date", "total_nav_krw"}
+        if not required_nav_cols.issubset(set(nav_df.columns)):
+            st.error("NAV 파일에는 최소 date,total_nav_krw 컬럼이 필요합니다.")
+        else:
+            if not flow_df.empty and {"date", "amount_krw", "flow_type"}.issubset(set(flow_df.columns)):
+                flow_df["amount_krw"] = pd.to_numeric(flow_df["amount_krw"], errors="coerce").fillna(0)
+                flow_df["flow_type"] = flow_df["flow_type"].astype(str).str.lower().str.strip()
+                flow_df["amount_krw"] = flow_df.apply(
+                    lambda r: abs(r["amount_krw"]) if r["flow_type"] == "deposit" else -abs(r["amount_krw"]),
+                    axis=1,
+                )
+                flow_input = flow_df[["date", "amount_krw"]]
+            else:
+                flow_input = pd.DataFrame(columns=["date", "amount_krw"])
+
+            twr_series_df, twr_total = calculate_twr(nav_df[["date", "total_nav_krw"]], flow_input)
+            if twr_series_df.empty:
+                st.warning("계산 가능한 NAV 데이터가 없습니다.")
+            else:
+                start_date = twr_series_df["date"].min()
+                end_date = twr_series_df["date"].max()
+                col_n1, col_n2, col_n3 = st.columns(3)
+                col_n1.metric("기간", f"{start_date} ~ {end_date}")
+                col_n2.metric("최종 NAV", f"₩{twr_series_df.iloc[-1]['total_nav_krw']:,.0f}")
+                col_n3.metric("TWR 수익률", f"{twr_total:+.2%}")
+
+                fig_nav = px.line(twr_series_df, x="date", y="cumulative_return", title="누적 NAV 수익률(TWR)")
+                fig_nav.update_yaxes(tickformat=".2%")
+                st.plotly_chart(fig_nav, width='stretch')
+
+                kospi_ret = get_simple_benchmark_return("KOSPI", start_date, end_date)
+                nasdaq_ret = get_simple_benchmark_return("NASDAQ", start_date, end_date)
+                if kospi_ret is None:
+                    kospi_ret = st.number_input("KOSPI 기간 수익률(수동입력, %)", value=0.0, step=0.1, key="manual_kospi") / 100
+                if nasdaq_ret is None:
+                    nasdaq_ret = st.number_input("NASDAQ 기간 수익률(수동입력, %)", value=0.0, step=0.1, key="manual_nasdaq") / 100
+
+                benchmark_df = pd.DataFrame([
+                    {"비교대상": "통합 NAV(TWR)", "수익률": twr_total},
+                    {"비교대상": "KOSPI", "수익률": kospi_ret},
+                    {"비교대상": "NASDAQ", "수익률": nasdaq_ret},
+                ])
+                st.dataframe(benchmark_df.style.format({"수익률": "{:+.2%}"}), hide_index=True, width='stretch')
+
+    st.info(
+        "CRON 예시: 매일 장마감 후 collector가 `data/nav_daily.csv`, `data/nav_cashflows.csv`를 갱신하도록 구성하세요. "
+        "대신 계좌는 웹수집기(Playwright 등)에서 `CREON_WEB_BALANCE_FILE` JSON을 갱신한 뒤 서버 파일/DB로 업로드하는 구조를 권장합니다."
+    )
+
+
 st.title("💼 통합 포트폴리오 대시보드")
 
 col1, col2, col3 = st.columns([5, 1, 0.5])
 with col2:
     if st.button("🔄", help="데이터 새로고침"):
         st.cache_data.clear()
+        reset_asset_cache()
         st.rerun()
 
 df, exchange_rates, rates_updated_time, portfolio_last_updated = load_data()
@@ -341,7 +959,8 @@ if not df.empty:
     
     with tab1:
         st.sidebar.header("필터 옵션")
-        account_list = ['전체'] + sorted(df['account_label'].unique().tolist())
+        # 범주형 categories는 이미 정렬되어 있어 별도 정렬이 필요 없습니다.
+        account_list = ['전체'] + df['account_label'].cat.categories.tolist()
         selected_account = st.sidebar.selectbox('계좌 선택', account_list)
         
         st.sidebar.markdown("---")
@@ -355,14 +974,29 @@ if not df.empty:
                     st.sidebar.metric(f"{currency}/KRW", f"{rate_to_krw:,.2f}원")
 
         filtered_df = df if selected_account == '전체' else df[df['account_label'] == selected_account]
+        
+        # 주식/예수금 마스크와 금액 배열은 한 번만 만들어 아래 모든 섹션에서 재사용합니다.
+        # asset_type은 범주형이라 범주 코드 하나와 비교하는 정수 비교로 마스크를 만듭니다.
+        asset_types = filtered_df['asset_type']
+        is_stock = asset_types.eq('stock').to_numpy()
+        is_cash = asset_types.eq('cash').to_numpy()
+        stock_df = filtered_df[is_stock]
+        cash_df = filtered_df[is_cash]
+        eval_arr = filtered_df['eval_amount_krw'].to_numpy()
+        principal_arr = filtered_df['principal_krw'].to_numpy()
+        # 계좌별 합계와 Top 10 종목도 필터 직후 한 번만 계산해 두고 차트에서 가져다 씁니다.
+        account_summary = summarize_by_account(filtered_df)
+        top_stocks = stock_df.nlargest(10, 'eval_amount_krw')
+        # 계좌 색상은 계좌별 파이와 시장 드릴다운 막대 차트가 함께 사용합니다.
+        account_color_map = _account_color_map(tuple(account_summary['account_label']))
 
         st.subheader("📊 총 자산 요약")
         
-        total_eval_krw = filtered_df['eval_amount_krw'].sum()
-        total_principal_krw = filtered_df['principal_krw'].sum()
+        total_eval_krw = eval_arr.sum()
+        total_principal_krw = principal_arr.sum()
         total_pl_krw = total_eval_krw - total_principal_krw
         total_return_rate = (total_pl_krw / total_principal_krw * 100) if total_principal_krw else 0
-        total_cash_krw = filtered_df[filtered_df['asset_type'] == 'cash']['eval_amount_krw'].sum()
+        total_cash_krw = eval_arr[is_cash].sum()
 
         col1, col2, col3, col4, col5 = st.columns(5)
         
@@ -380,96 +1014,38 @@ if not df.empty:
 
         with col_chart1:
             if not filtered_df.empty:
-                account_summary = filtered_df.groupby('account_label')['eval_amount_krw'].sum().reset_index()
-                
-                color_map = {}
-                for account in account_summary['account_label']:
-                    if '조현익' in account:
-                        color_map[account] = '#c7b273'
-                    elif '뮤사이' in account:
-                        if '키움' in account:
-                            color_map[account] = '#BFBFBF'
-                        elif '한투' in account:
-                            color_map[account] = '#E5E5E5'
-                        else:
-                            color_map[account] = '#D3D3D3'
-                    else:
-                        color_map[account] = None
-                
-                fig = px.pie(account_summary, names='account_label', values='eval_amount_krw', 
-                            title='계좌별 비중', hole=0.35,
-                            color='account_label',
-                            color_discrete_map=color_map)
-                fig.update_traces(
-                    textposition='inside', 
-                    texttemplate='<b>%{label}</b><br>%{percent}',
-                    textfont=dict(size=12, family='Arial')
-                )
-                fig.update_layout(
-                    height=450, 
-                    showlegend=True, 
-                    legend=dict(
-                        orientation="h",
-                        yanchor="top",
-                        y=-0.15,
-                        xanchor="center",
-                        x=0.5,
-                        font=dict(size=10)
-                    ),
-                    margin=dict(l=10, r=10, t=50, b=80)
+                fig_dict = build_pie_figure(
+                    account_summary, 'account_label', '계좌별 비중', color_map=account_color_map
                 )
-                st.plotly_chart(fig, width='stretch')
+                st.plotly_chart(go.Figure(fig_dict), width='stretch')
 
         with col_chart2:
-            stock_df = filtered_df[filtered_df['asset_type']=='stock']
             if not stock_df.empty:
-                top_stocks = stock_df.nlargest(10, 'eval_amount_krw').copy()
-                
-                top_stocks['display_name'] = top_stocks.apply(
-                    lambda row: row['name'] if row['market'] == 'domestic' else row['ticker'], 
-                    axis=1
-                )
-                
-                stock_colors = [
-                    '#8B9DC3', '#A8B5C7', '#9CA8B8', '#B8C5D6', '#9EAAB5',
-                    '#C9D6E3', '#7B8FA3', '#A6B4C4', '#BCC9D8', '#8C9CAD'
-                ]
+                # 국내는 종목명, 해외는 티커로 표시 (행 단위 apply 대신 np.where)
+                # market은 범주형이므로 eq가 문자열 대신 범주 코드로 비교합니다.
+                top_stocks = top_stocks.assign(display_name=np.where(
+                    top_stocks['market'].eq('domestic').to_numpy(),
+                    top_stocks['name'].to_numpy(),
+                    top_stocks['ticker'].to_numpy(),
+                ))
                 
-                fig = px.pie(top_stocks, names='display_name', values='eval_amount_krw', 
-                            title='종목별 비중 (Top 10)', hole=0.35,
-                            color_discrete_sequence=stock_colors)
-                fig.update_traces(
-                    textposition='inside', 
-                    texttemplate='<b>%{label}</b><br>%{percent}',
-                    textfont=dict(size=12, family='Arial')
+                fig_dict = build_pie_figure(
+                    top_stocks[['display_name', 'eval_amount_krw']], 'display_name', '종목별 비중 (Top 10)',
+                    colors=STOCK_PIE
                 )
-                fig.update_layout(
-                    height=450, 
-                    showlegend=True, 
-                    legend=dict(
-                        orientation="h",
-                        yanchor="top",
-                        y=-0.15,
-                        xanchor="center",
-                        x=0.5,
-                        font=dict(size=10)
-                    ),
-                    margin=dict(l=10, r=10, t=50, b=80)
-                )
-                st.plotly_chart(fig, width='stretch')
+                st.plotly_chart(go.Figure(fig_dict), width='stretch')
 
         with col_chart3:
-            stock_only_df = filtered_df[
-                (filtered_df['asset_type'] == 'stock') & 
-                (filtered_df['market'].notna())
-            ].copy()
+            stock_only_df = stock_df[stock_df['market'].notna()]
             
             if not stock_only_df.empty:
-                # 1. 데이터 타입 안전 변환
-                stock_only_df['eval_amount_krw'] = pd.to_numeric(stock_only_df['eval_amount_krw'], errors='coerce').fillna(0)
-                
-                # 2. market 값을 정규화 (공백 제거, 소문자 변환)
-                stock_only_df['market'] = stock_only_df['market'].astype(str).str.strip().str.lower()
+                # 1. 데이터 타입 안전 변환, 2. market 값을 정규화 (공백 제거, 소문자 변환)
+                # 원본 슬라이스를 복사하지 않고 assign으로 필요한 컬럼만 새로 씁니다.
+                # market은 범주형이라 map이 행이 아닌 범주(2~3개)에만 적용됩니다.
+                stock_only_df = stock_only_df.assign(
+                    eval_amount_krw=pd.to_numeric(stock_only_df['eval_amount_krw'], errors='coerce').fillna(0),
+                    market=stock_only_df['market'].map(lambda m: str(m).strip().lower()),
+                )
                 
                 # 3. 유효한 market 값만 필터링 (domestic 또는 overseas만 허용)
                 valid_markets = ['domestic', 'overseas']
@@ -478,87 +1054,30 @@ if not df.empty:
                 if not stock_only_df.empty:
                     # 4. market별로 직접 합계 계산 - 원본 데이터 그대로 사용
                     # 중복 없이 정확히 계산하기 위해 groupby 사용 (같은 종목이 여러 계좌에 있어도 각각 계산)
-                    domestic_total = stock_only_df[stock_only_df['market'] == 'domestic']['eval_amount_krw'].sum()
-                    overseas_total = stock_only_df[stock_only_df['market'] == 'overseas']['eval_amount_krw'].sum()
-                    
-                    # 디버깅: 실제 계산 값 확인
-                    total_all = domestic_total + overseas_total
+                    market_totals = stock_only_df.groupby('market', observed=True)['eval_amount_krw'].sum()
+                    domestic_total = market_totals.get('domestic', 0.0)
+                    overseas_total = market_totals.get('overseas', 0.0)
                     
                     # 값이 제대로 계산되었는지 검증
                     domestic_total = float(domestic_total) if not pd.isna(domestic_total) else 0.0
                     overseas_total = float(overseas_total) if not pd.isna(overseas_total) else 0.0
                     
-                    # 5. 차트용 데이터프레임 직접 생성 (0보다 큰 값만)
-                    market_data = []
+                    # 5. 0보다 큰 값만 go.Pie 입력 리스트로 바로 구성 (중간 DataFrame 생성 X)
+                    markets, labels, values = [], [], []
                     if domestic_total > 0:
-                        market_data.append({
-                            'market': 'domestic', 
-                            'market_label': '국내', 
-                            'eval_amount_krw': float(domestic_total)
-                        })
+                        markets.append('domestic')
+                        labels.append('국내')
+                        values.append(domestic_total)
                     if overseas_total > 0:
-                        market_data.append({
-                            'market': 'overseas', 
-                            'market_label': '해외', 
-                            'eval_amount_krw': float(overseas_total)
-                        })
+                        markets.append('overseas')
+                        labels.append('해외')
+                        values.append(overseas_total)
                     
-                    if market_data:
-                        market_summary = pd.DataFrame(market_data)
+                    if values:
+                        # 6. 차트 생성 - go.Figure로 직접 생성하여 값 전달 문제 해결
+                        fig = go.Figure(build_market_pie_figure(tuple(labels), tuple(values)))
                         
-                        # 값이 제대로 설정되었는지 확인
-                        market_summary['eval_amount_krw'] = pd.to_numeric(market_summary['eval_amount_krw'], errors='coerce').fillna(0)
-                        
-                        # 디버깅: 실제 계산된 값 확인 (개발 중에만)
-                        # st.write(f"디버그 - 국내: {domestic_total:,.0f}, 해외: {overseas_total:,.0f}")
-                        
-                        # 6. 색상 맵 정의
-                        market_colors_map = {
-                            '국내': '#003478',
-                            '해외': '#B22234'
-                        }
-                        
-                        # 7. 차트 생성 - go.Figure로 직접 생성하여 값 전달 문제 해결
-                        labels = market_summary['market_label'].tolist()
-                        values = market_summary['eval_amount_krw'].tolist()
-                        colors = [market_colors_map.get(label, '#808080') for label in labels]
-                        
-                        # 값이 제대로 숫자인지 확인
-                        values = [float(v) for v in values]
-                        
-                        fig = go.Figure(data=[go.Pie(
-                            labels=labels,
-                            values=values,
-                            hole=0.35,
-                            marker=dict(colors=colors),
-                            textposition='inside',
-                            texttemplate='<b>%{label}</b><br>%{percent}',
-                            textfont=dict(size=12, family='Arial'),
-                            hovertemplate='<b>%{label}</b><br>평가금액: ₩%{value:,.0f}<br>비중: %{percent}<extra></extra>'
-                        )])
-                        
-                        fig.update_layout(
-                            title={
-                                'text': '국내/해외 비중',
-                                'font': {'color': 'white'}
-                            },
-                            height=450,
-                            showlegend=True,
-                            legend=dict(
-                                orientation="h",
-                                yanchor="top",
-                                y=-0.15,
-                                xanchor="center",
-                                x=0.5,
-                                font=dict(size=10, color='white')
-                            ),
-                            margin=dict(l=10, r=10, t=50, b=80),
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            font=dict(color='white')
-                        )
-                        
-                        # 8. 클릭 이벤트 처리
+                        # 7. 클릭 이벤트 처리
                         if PLOTLY_EVENTS_AVAILABLE:
                             selected_points = plotly_events(
                                 fig,
@@ -572,8 +1091,8 @@ if not df.empty:
                             if selected_points and len(selected_points) > 0:
                                 if 'pointNumber' in selected_points[0]:
                                     point_index = selected_points[0]['pointNumber']
-                                    # 직접 만든 데이터프레임에서 market 값 가져오기
-                                    selected_market = market_summary.iloc[point_index]['market']
+                                    # 차트 입력 순서와 같은 markets 리스트에서 market 값 가져오기
+                                    selected_market = markets[point_index]
                                     
                                     if st.session_state.get('selected_market') != selected_market:
                                         st.session_state['selected_market'] = selected_market
@@ -595,133 +1114,56 @@ if not df.empty:
             
             st.subheader(f"📊 {market_name} 종목 구성")
             
-            selected_market_stocks = filtered_df[
-                (filtered_df['market'] == selected_market) & 
-                (filtered_df['asset_type'] == 'stock')
-            ].copy()
+            selected_market_stocks = stock_df[stock_df['market'] == selected_market]
             
             if not selected_market_stocks.empty:
-                top_stocks = selected_market_stocks.nlargest(10, 'eval_amount_krw').copy()
-                top_stocks['display_name'] = top_stocks['name']
+                top_stocks = selected_market_stocks.nlargest(10, 'eval_amount_krw')
+                top_stocks = top_stocks.assign(display_name=top_stocks['name'])
                 
                 # 파이 차트 색상
-                if selected_market == 'domestic':
-                    pie_colors = ['#003478', '#0047AB', '#4169E1', '#5B9BD5', '#6FA8DC',
-                                 '#93C5FD', '#A8DADC', '#B4D7E8', '#C9E4F7', '#DBEAFE']
-                else:
-                    pie_colors = ['#B22234', '#DC143C', '#E63946', '#F08080', '#FA8072',
-                                 '#FFB6C1', '#FFC0CB', '#FFD1DC', '#FFE4E1', '#FFF0F5']
+                pie_colors = DOMESTIC_PIE if selected_market == 'domestic' else OVERSEAS_PIE
                 
-                # 계좌별 색상 매핑
-                account_color_map = {}
-                for account in filtered_df['account_label'].unique():
-                    if '조현익' in account:
-                        account_color_map[account] = '#c7b273'
-                    elif '뮤사이' in account:
-                        if '키움' in account:
-                            account_color_map[account] = '#BFBFBF'
-                        elif '한투' in account:
-                            account_color_map[account] = '#E5E5E5'
-                        else:
-                            account_color_map[account] = '#D3D3D3'
-                    else:
-                        account_color_map[account] = '#1f77b4'
+                # 파이/막대 차트는 서로 독립적인 순수 CPU 작업이라 두 스레드에서 동시에 생성
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    pie_future = executor.submit(build_market_detail_pie, top_stocks, pie_colors, market_name)
+                    bar_future = executor.submit(
+                        build_market_detail_bar, top_stocks, selected_market_stocks, account_color_map, market_name
+                    )
+                    fig_detail, fig_bar = pie_future.result(), bar_future.result()
                 
                 col1, col2 = st.columns([1, 1])
                 
                 with col1:
-                    fig_detail = px.pie(
-                        top_stocks, 
-                        names='display_name', 
-                        values='eval_amount_krw',
-                        title=f'{market_name} Top 10 종목',
-                        hole=0.35,
-                        color_discrete_sequence=pie_colors
-                    )
-                    fig_detail.update_traces(
-                        textposition='inside',
-                        texttemplate='<b>%{label}</b><br>%{percent}',
-                        textfont=dict(size=12, family='Arial')
-                    )
-                    fig_detail.update_layout(
-                        height=500,
-                        showlegend=True,
-                        legend=dict(
-                            orientation="v",
-                            yanchor="middle",
-                            y=0.5,
-                            xanchor="left",
-                            x=1.05,
-                            font=dict(size=10, family='Arial')
-                        )
-                    )
                     st.plotly_chart(fig_detail, width='stretch')
                 
                 with col2:
-                    fig_bar = go.Figure()
-                    
-                    for idx, row in top_stocks.sort_values('eval_amount_krw', ascending=True).iterrows():
-                        stock_name = row['display_name']
-                        stock_detail = selected_market_stocks[
-                            selected_market_stocks['name'] == row['name']
-                        ]
-                        
-                        for _, detail_row in stock_detail.iterrows():
-                            account = detail_row['account_label']
-                            amount = detail_row['eval_amount_krw']
-                            
-                            fig_bar.add_trace(go.Bar(
-                                y=[stock_name],
-                                x=[amount],
-                                name=account,
-                                orientation='h',
-                                marker=dict(color=account_color_map.get(account, '#1f77b4')),
-                                text=f'₩{amount:,.0f}',
-                                textposition='inside',
-                                textfont=dict(size=10),
-                                hovertemplate=f'<b>{account}</b><br>₩{amount:,.0f}<extra></extra>',
-                                showlegend=True if idx == top_stocks.index[0] else False,
-                                legendgroup=account
-                            ))
-                    
-                    fig_bar.update_layout(
-                        title=f'{market_name} Top 10 평가금액 (계좌별)',
-                        height=500,
-                        barmode='stack',
-                        xaxis_title="평가금액 (원)",
-                        yaxis_title="",
-                        showlegend=True,
-                        legend=dict(
-                            title="계좌",
-                            orientation="v",
-                            yanchor="top",
-                            y=1,
-                            xanchor="left",
-                            x=1.05,
-                            font=dict(size=9, family='Arial')
-                        ),
-                        margin=dict(l=10, r=150, t=50, b=50)
-                    )
-                    
                     st.plotly_chart(fig_bar, width='stretch')
                 
                 st.markdown("#### 📋 상세 내역")
-                detail_table = selected_market_stocks.copy()
-                detail_table = detail_table.sort_values('eval_amount_krw', ascending=False)
+                detail_sorted = selected_market_stocks.sort_values('eval_amount_krw', ascending=False)
+                detail_eval = detail_sorted['eval_amount_krw'].to_numpy(dtype=float)
                 
-                detail_table['종목명'] = detail_table['name']
-                detail_table['티커'] = detail_table['ticker']
-                detail_table['계좌'] = detail_table['account_label']
-                detail_table['평가금액'] = detail_table['eval_amount_krw'].apply(lambda x: f"₩{x:,.0f}")
-                detail_table['비중(%)'] = (detail_table['eval_amount_krw'] / detail_table['eval_amount_krw'].sum() * 100).apply(lambda x: f"{x:.2f}%")
-                detail_table['수익률(%)'] = detail_table.apply(
-                    lambda row: f"{(row['profit_loss_krw'] / (row['eval_amount_krw'] - row['profit_loss_krw']) * 100):+.2f}%" 
-                    if (row['eval_amount_krw'] - row['profit_loss_krw']) > 0 else "0.00%",
-                    axis=1
-                )
+                # 수익률 = 손익 / (평가금액 - 손익), 분모가 0 이하이면 0.00%
+                pl_arr = detail_sorted['profit_loss_krw'].to_numpy(dtype=float)
+                cost_arr = detail_eval - pl_arr
+                has_cost = cost_arr > 0
+                detail_rate = np.divide(pl_arr, cost_arr, out=np.zeros_like(pl_arr), where=has_cost) * 100
+                
+                # 표시용 문자열 컬럼만 담은 작은 DataFrame을 직접 생성 (원본 숫자 프레임 복사 X)
+                detail_table = pd.DataFrame({
+                    '종목명': detail_sorted['name'],
+                    '티커': detail_sorted['ticker'],
+                    '계좌': detail_sorted['account_label'],
+                    '평가금액': [f"₩{x:,.0f}" for x in detail_eval],
+                    # 비중 문자열은 np.char.mod로 배열 전체를 한 번에 포맷
+                    '비중(%)': np.char.mod('%.2f%%', detail_eval / detail_eval.sum() * 100),
+                    '수익률(%)': [
+                        f"{rate:+.2f}%" if ok else "0.00%" for rate, ok in zip(detail_rate, has_cost)
+                    ],
+                }, index=detail_sorted.index)
                 
                 st.dataframe(
-                    detail_table[['종목명', '티커', '계좌', '평가금액', '비중(%)', '수익률(%)']],
+                    detail_table,
                     hide_index=True,
                     width='stretch'
                 )
@@ -735,16 +1177,27 @@ if not df.empty:
         st.markdown("---")
         st.subheader("📋 계좌별 상세 보유 현황")
         
-        stock_only = filtered_df[filtered_df['asset_type'] == 'stock'].copy()
-        
-        if not stock_only.empty:
-            for account_label in sorted(stock_only['account_label'].unique()):
-                account_stocks = stock_only[stock_only['account_label'] == account_label]
-                
-                account_eval = account_stocks['eval_amount_krw'].sum()
-                account_principal = account_stocks['principal_krw'].sum()
-                account_pl = account_eval - account_principal
-                account_pl_rate = (account_pl / account_principal * 100) if account_principal > 0 else 0
+        if not stock_df.empty:
+            # 계좌별 평가/원금/손익/수익률을 groupby 한 번으로 계산 (계좌마다 재필터링 X)
+            account_groups = stock_df.groupby('account_label', sort=True, observed=True)
+            account_agg = account_groups.agg(
+                eval_krw=('eval_amount_krw', 'sum'),
+                principal_krw=('principal_krw', 'sum'),
+                profit_loss_krw=('profit_loss_krw', 'sum'),
+            )
+            agg_principal = account_agg['principal_krw'].to_numpy(dtype=float)
+            account_agg['pl'] = account_agg['eval_krw'] - account_agg['principal_krw']
+            account_agg['rate'] = np.divide(
+                account_agg['pl'].to_numpy(dtype=float), agg_principal,
+                out=np.zeros_like(agg_principal), where=agg_principal > 0,
+            ) * 100
+            
+            # 그룹 순회 순서(계좌명 정렬)와 account_agg 행 순서가 같으므로 나란히 순회합니다.
+            for (account_label, account_stocks), acct in zip(account_groups, account_agg.itertuples()):
+                account_eval = acct.eval_krw
+                account_principal = acct.principal_krw
+                account_pl = acct.pl
+                account_pl_rate = acct.rate
                 
                 pl_display = f"+₩{account_pl:,.0f}" if account_pl >= 0 else f"-₩{abs(account_pl):,.0f}"
                 rate_display = f"{account_pl_rate:+.1f}%"
@@ -752,59 +1205,59 @@ if not df.empty:
                 expander_title = f"**{account_label}** | 평가: ₩{account_eval:,.0f} | 손익: {pl_display} ({rate_display})"
                 
                 with st.expander(expander_title, expanded=False):
-                    display_stocks = account_stocks[['name', 'ticker', 'quantity', 'avg_buy_price', 
-                                                     'current_price', 'principal_krw', 'eval_amount_krw', 
-                                                     'profit_loss_krw']].copy()
-                    
-                    display_stocks['weight'] = (display_stocks['eval_amount_krw'] / account_eval * 100).round(1)
-                    display_stocks['profit_rate'] = (
-                        (display_stocks['profit_loss_krw'] / display_stocks['principal_krw'] * 100)
-                        .fillna(0).round(1)
+                    weight = (account_stocks['eval_amount_krw'] / account_eval * 100).round(1)
+                    # 원금 0이면 0% - np.divide(where=)로 한 번에 계산하고 제자리에서 반올림
+                    stock_pl = account_stocks['profit_loss_krw'].to_numpy(dtype=float)
+                    stock_principal = account_stocks['principal_krw'].to_numpy(dtype=float)
+                    profit_rate = np.divide(
+                        stock_pl, stock_principal, out=np.zeros_like(stock_pl), where=stock_principal != 0
                     )
+                    profit_rate *= 100
+                    np.round(profit_rate, 1, out=profit_rate)
                     
-                    display_stocks['종목명'] = display_stocks['name']
-                    display_stocks['티커'] = display_stocks['ticker']
-                    display_stocks['수량'] = display_stocks['quantity'].apply(lambda x: f"{int(x):,}")
-                    display_stocks['평단가'] = display_stocks['avg_buy_price'].apply(lambda x: f"{x:,.2f}")
-                    display_stocks['현재가'] = display_stocks['current_price'].apply(lambda x: f"{x:,.2f}")
-                    display_stocks['투자원금'] = display_stocks['principal_krw'].apply(lambda x: f"₩{x:,.0f}")
-                    display_stocks['평가금액'] = display_stocks['eval_amount_krw'].apply(lambda x: f"₩{x:,.0f}")
-                    display_stocks['손익'] = display_stocks['profit_loss_krw'].apply(
-                        lambda x: f"+₩{x:,.0f}" if x >= 0 else f"-₩{abs(x):,.0f}"
-                    )
-                    display_stocks['수익률(%)'] = display_stocks['profit_rate'].apply(lambda x: f"{x:+.1f}%")
-                    display_stocks['비중(%)'] = display_stocks['weight'].apply(lambda x: f"{x:.1f}%")
+                    # 숫자 컬럼 그대로 새 DataFrame 구성 (account_stocks 복사 X, 포맷은 Styler.format에서)
+                    display_stocks = pd.DataFrame({
+                        '종목명': account_stocks['name'],
+                        '티커': account_stocks['ticker'],
+                        '수량': account_stocks['quantity'],
+                        '평단가': account_stocks['avg_buy_price'],
+                        '현재가': account_stocks['current_price'],
+                        '투자원금': account_stocks['principal_krw'],
+                        '평가금액': account_stocks['eval_amount_krw'],
+                        '손익': account_stocks['profit_loss_krw'],
+                        '수익률(%)': pd.Series(profit_rate, index=account_stocks.index),
+                        '비중(%)': weight,
+                    })
                     
-                    total_principal_sum = display_stocks['principal_krw'].sum()
-                    total_eval_sum = display_stocks['eval_amount_krw'].sum()
-                    total_pl_sum = display_stocks['profit_loss_krw'].sum()
+                    total_principal_sum = account_principal
+                    total_eval_sum = account_eval
+                    total_pl_sum = acct.profit_loss_krw
                     
+                    # 합계 행의 수량/단가는 비워 둡니다 (NaN -> na_rep='')
                     total_row = pd.DataFrame([{
                         '종목명': '**합계**',
                         '티커': '',
-                        '수량': '',
-                        '평단가': '',
-                        '현재가': '',
-                        '투자원금': f"₩{total_principal_sum:,.0f}",
-                        '평가금액': f"₩{total_eval_sum:,.0f}",
-                        '손익': f"+₩{total_pl_sum:,.0f}" if total_pl_sum >= 0 else f"-₩{abs(total_pl_sum):,.0f}",
-                        '수익률(%)': f"{account_pl_rate:+.1f}%",
-                        '비중(%)': '100.0%'
+                        '수량': np.nan,
+                        '평단가': np.nan,
+                        '현재가': np.nan,
+                        '투자원금': total_principal_sum,
+                        '평가금액': total_eval_sum,
+                        '손익': total_pl_sum,
+                        '수익률(%)': account_pl_rate,
+                        '비중(%)': 100.0
                     }])
                     
-                    display_with_total = pd.concat([
-                        display_stocks[['종목명', '티커', '수량', '평단가', '현재가', 
-                                       '투자원금', '평가금액', '손익', '수익률(%)', '비중(%)']],
-                        total_row
-                    ], ignore_index=True)
-                    
-                    def highlight_negative(val):
-                        if isinstance(val, str):
-                            if '-₩' in val or (val.startswith('-') and '%' in val):
-                                return 'color: #FF4B4B'
-                        return ''
+                    display_with_total = pd.concat([display_stocks, total_row], ignore_index=True)
                     
-                    styled_df = display_with_total.style.map(highlight_negative, subset=['손익', '수익률(%)'])
+                    # 음수 강조는 문자열을 셀마다 검사하지 않고 숫자 부호로 한 번에 계산 (마지막 행은 합계)
+                    # 수익률은 '-0.0%'처럼 표시되는 값도 강조되도록 signbit로 부호를 봅니다.
+                    negative_masks = {
+                        '손익': np.append(account_stocks['profit_loss_krw'].to_numpy() < 0, total_pl_sum < 0),
+                        '수익률(%)': np.signbit(np.append(profit_rate, account_pl_rate)),
+                    }
+                    styled_df = display_with_total.style.format(HOLDINGS_FORMATS, na_rep='').apply(
+                        highlight_negative, subset=['손익', '수익률(%)'], masks=negative_masks
+                    )
                     
                     st.dataframe(
                         styled_df,
@@ -815,34 +1268,21 @@ if not df.empty:
         st.markdown("---")
         st.subheader("📈 전체 종목 요약")
         
-        if not stock_only.empty:
-            stock_summary = stock_only.groupby(['ticker', 'name', 'currency']).agg({
-                'eval_amount_krw': 'sum',
-                'principal_krw': 'sum',
-                'quantity': 'sum'
-            }).reset_index()
-            
-            stock_summary['profit_loss_krw'] = stock_summary['eval_amount_krw'] - stock_summary['principal_krw']
-            stock_summary['profit_rate'] = (
-                (stock_summary['profit_loss_krw'] / stock_summary['principal_krw'] * 100)
-                .fillna(0).round(1)
-            )
-            stock_summary['weight'] = (stock_summary['eval_amount_krw'] / stock_summary['eval_amount_krw'].sum() * 100).round(1)
+        if not stock_df.empty:
+            stock_summary = summarize_stocks(stock_df)
             
-            stock_summary = stock_summary.sort_values('eval_amount_krw', ascending=False).reset_index(drop=True)
-            
-            display_summary = stock_summary.copy()
-            display_summary['종목명'] = display_summary['name']
-            display_summary['티커'] = display_summary['ticker']
-            display_summary['통화'] = display_summary['currency']
-            display_summary['수량'] = display_summary['quantity'].apply(lambda x: f"{int(x):,}")
-            display_summary['투자원금'] = display_summary['principal_krw'].apply(lambda x: f"₩{x:,.0f}")
-            display_summary['평가금액'] = display_summary['eval_amount_krw'].apply(lambda x: f"₩{x:,.0f}")
-            display_summary['손익'] = display_summary['profit_loss_krw'].apply(
-                lambda x: f"+₩{x:,.0f}" if x >= 0 else f"-₩{abs(x):,.0f}"
-            )
-            display_summary['수익률(%)'] = display_summary['profit_rate'].apply(lambda x: f"{x:+.1f}%")
-            display_summary['비중(%)'] = display_summary['weight'].apply(lambda x: f"{x:.1f}%")
+            # 표는 숫자 그대로 두고 문자열 포맷은 Styler.format으로 렌더링 시점에만 적용합니다.
+            display_summary = pd.DataFrame({
+                '종목명': stock_summary['name'],
+                '티커': stock_summary['ticker'],
+                '통화': stock_summary['currency'],
+                '수량': stock_summary['quantity'],
+                '투자원금': stock_summary['principal_krw'],
+                '평가금액': stock_summary['eval_amount_krw'],
+                '손익': stock_summary['profit_loss_krw'],
+                '수익률(%)': stock_summary['profit_rate'],
+                '비중(%)': stock_summary['weight'],
+            })
             
             total_stock_principal = stock_summary['principal_krw'].sum()
             total_stock_eval = stock_summary['eval_amount_krw'].sum()
@@ -853,26 +1293,23 @@ if not df.empty:
                 '종목명': '**합계**',
                 '티커': '',
                 '통화': '',
-                '수량': f"{int(stock_summary['quantity'].sum()):,}",
-                '투자원금': f"₩{total_stock_principal:,.0f}",
-                '평가금액': f"₩{total_stock_eval:,.0f}",
-                '손익': f"+₩{total_stock_pl:,.0f}" if total_stock_pl >= 0 else f"-₩{abs(total_stock_pl):,.0f}",
-                '수익률(%)': f"{total_stock_rate:+.1f}%",
-                '비중(%)': '100.0%'
+                '수량': stock_summary['quantity'].sum(),
+                '투자원금': total_stock_principal,
+                '평가금액': total_stock_eval,
+                '손익': total_stock_pl,
+                '수익률(%)': total_stock_rate,
+                '비중(%)': 100.0
             }])
             
-            display_summary_with_total = pd.concat([
-                display_summary[['종목명', '티커', '통화', '수량', '투자원금', '평가금액', '손익', '수익률(%)', '비중(%)']],
-                total_row_summary
-            ], ignore_index=True)
+            display_summary_with_total = pd.concat([display_summary, total_row_summary], ignore_index=True)
             
-            def highlight_negative(val):
-                if isinstance(val, str):
-                    if '-₩' in val or (val.startswith('-') and '%' in val):
-                        return 'color: #FF4B4B'
-                return ''
-            
-            styled_summary = display_summary_with_total.style.map(highlight_negative, subset=['손익', '수익률(%)'])
+            # 음수 강조는 숫자 컬럼의 부호로 한 번에 계산 (마지막 행은 합계)
+            negative_masks = {
+                col: display_summary_with_total[col].to_numpy(dtype=float) < 0 for col in ('손익', '수익률(%)')
+            }
+            styled_summary = display_summary_with_total.style.format(HOLDINGS_FORMATS).apply(
+                highlight_negative, subset=['손익', '수익률(%)'], masks=negative_masks
+            )
             
             st.dataframe(
                 styled_summary,
@@ -880,271 +1317,47 @@ if not df.empty:
                 width='stretch'
             )
             
-            csv = display_summary.to_csv(index=False).encode('utf-8-sig')
+            # CSV는 표와 같은 컬럼을 숫자 원본 그대로 내보냅니다.
+            # 다운로드를 누를 때만 직렬화하고, 같은 표는 캐시된 바이트를 그대로 씁니다.
             st.download_button(
                 label="📥 CSV 다운로드",
-                data=csv,
+                data=lambda: _to_csv_bytes(display_summary),
                 file_name=f"portfolio_summary_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
+                mime="text/csv",
+                on_click="ignore"  # 다운로드만 하고 페이지 전체를 다시 실행하지 않음
             )
         
         st.markdown("---")
         st.subheader("💰 예수금 현황")
         
-        cash_df = filtered_df[filtered_df['asset_type'] == 'cash'].copy()
         if not cash_df.empty:
-            account_cash_summary = cash_df.groupby('account_label')['eval_amount_krw'].sum().reset_index()
-            account_cash_summary = account_cash_summary.sort_values('eval_amount_krw', ascending=False)
+            # groupby 한 번으로 계좌별 합계와 상세 행을 모두 얻습니다 (계좌마다 재필터링 X)
+            cash_groups = cash_df.groupby('account_label', observed=True)
+            cash_totals = cash_groups['eval_amount_krw'].sum().sort_values(ascending=False)
             
-            for _, row in account_cash_summary.iterrows():
-                account = row['account_label']
-                account_total_krw = row['eval_amount_krw']
-                
-                account_cash_detail = cash_df[cash_df['account_label'] == account].copy()
+            for account, account_total_krw in cash_totals.items():
+                account_cash_detail = cash_groups.get_group(account)
                 
                 with st.expander(f"**{account}** | 총 예수금: ₩{account_total_krw:,.0f}", expanded=False):
-                    detail_display = account_cash_detail[['currency', 'eval_amount', 'eval_amount_krw']].copy()
-                    detail_display['통화'] = detail_display['currency']
-                    detail_display['보유액'] = detail_display.apply(
-                        lambda r: f"{r['currency']} {r['eval_amount']:,.2f}", axis=1
-                    )
-                    detail_display['원화환산'] = detail_display['eval_amount_krw'].apply(lambda x: f"₩{x:,.0f}")
+                    # 표시용 컬럼만 담은 프레임을 직접 만들어 상세 행을 복사하지 않습니다.
+                    cash_currency = account_cash_detail['currency'].astype(str)
+                    detail_display = pd.DataFrame({
+                        '통화': cash_currency,
+                        '보유액': cash_currency + ' ' + account_cash_detail['eval_amount'].map('{:,.2f}'.format),
+                        '원화환산': fmt_krw(account_cash_detail['eval_amount_krw']),
+                    })
                     
                     st.dataframe(
-                        detail_display[['통화', '보유액', '원화환산']],
+                        detail_display,
                         hide_index=True,
                         width='stretch'
                     )
 
     with tab2:
-        st.subheader("🏢 뮤사이(법인) 재무현황")
-        st.caption("상단은 약식 재무상태표/손익계산서만 표시하고, 수정은 하단 'Modify' 영역에서만 수행합니다.")
-        from stock import get_kis_collateral_loan_balance, load_creon_web_balance
-
-        report_date = st.date_input("기준일", value=datetime.now(KST).date(), key="corp_report_date")
-        musai_corp_df = df[df["account_label"].str.contains("뮤사이", na=False)].copy()
-        musai_securities_krw = musai_corp_df[musai_corp_df["asset_type"].isin(["stock", "cash"])]["eval_amount_krw"].sum()
-        creon_balance = load_creon_web_balance()
-        musai_securities_krw += float(creon_balance.get("eval_amount_krw", 0.0))
-        amort = calculate_copyright_amortization(report_date=report_date)
-
-        # 기본값(수정은 하단 Modify에서만)
-        defaults = {
-            "related_party_principal": 300_000_000,
-            "related_party_rate": 4.6,
-            "rcps_1_principal": 180_000_000,
-            "rcps_2_principal": 262_800_000,
-            "rcps_rate": 2.0,
-            "kibo_principal": 70_000_000,
-            "kibo_rate": 3.25,
-            "kosme_principal": 100_000_000,
-            "kosme_rate": 2.5,
-            "collateral_loan_rate": 5.5,
-            "sales": 32_376_011,
-            "opex": 72_326_973,
-            "interest_income": 9_635_962,
-            "dividend_income": 11_743_963,
-            "sec_gain": 88_348_971,
-            "sec_loss": 34_899_317,
-            "interest_expense": 20_465_270,
-        }
-        for k, v in defaults.items():
-            st.session_state.setdefault(f"corp_{k}", v)
-        st.session_state.setdefault("corp_kosme_start", datetime(report_date.year, 1, 1).date())
-
-        kis_loan_result = get_kis_collateral_loan_balance(prefix="C")
-        kis_collateral_loan_krw = float(kis_loan_result.get("loan_balance", 0.0))
-        st.session_state.setdefault("corp_kis_collateral_loan", kis_collateral_loan_krw)
-
-        related_party_principal = float(st.session_state["corp_related_party_principal"])
-        related_party_rate = float(st.session_state["corp_related_party_rate"])
-        rcps_1_principal = float(st.session_state["corp_rcps_1_principal"])
-        rcps_2_principal = float(st.session_state["corp_rcps_2_principal"])
-        rcps_rate = float(st.session_state["corp_rcps_rate"])
-        kibo_principal = float(st.session_state["corp_kibo_principal"])
-        kibo_rate = float(st.session_state["corp_kibo_rate"])
-        kosme_principal = float(st.session_state["corp_kosme_principal"])
-        kosme_rate = float(st.session_state["corp_kosme_rate"])
-        collateral_loan_rate = float(st.session_state["corp_collateral_loan_rate"])
-        kis_collateral_loan_krw = float(st.session_state["corp_kis_collateral_loan"])
-        sales_amount = float(st.session_state["corp_sales"])
-        opex_amount = float(st.session_state["corp_opex"])
-        interest_income = float(st.session_state["corp_interest_income"])
-        dividend_income = float(st.session_state["corp_dividend_income"])
-        sec_gain = float(st.session_state["corp_sec_gain"])
-        sec_loss = float(st.session_state["corp_sec_loss"])
-        interest_expense = float(st.session_state["corp_interest_expense"])
-
-        kosme = calculate_kosme_loan_schedule(
-            report_date=report_date,
-            principal=kosme_principal,
-            annual_rate=kosme_rate / 100,
-            amort_months=36,
-            repayment_start_date=st.session_state["corp_kosme_start"],
-        )
-
-        total_liabilities = (
-            related_party_principal
-            + kibo_principal
-            + kosme["remaining_principal"]
-            + rcps_1_principal
-            + rcps_2_principal
-            + kis_collateral_loan_krw
-        )
-        weighted_avg_rate = (
-            (related_party_principal * related_party_rate)
-            + (kibo_principal * kibo_rate)
-            + (kosme["remaining_principal"] * kosme_rate)
-            + (rcps_1_principal * rcps_rate)
-            + (rcps_2_principal * rcps_rate)
-            + (kis_collateral_loan_krw * collateral_loan_rate)
-        ) / max(total_liabilities, 1)
-
-        total_assets_est = musai_securities_krw + amort["net_book_value"]
-        equity_est = total_assets_est - total_liabilities
-
-        operating_profit = sales_amount - opex_amount
-        non_operating_income = interest_income + dividend_income + sec_gain
-        non_operating_expense = interest_expense + sec_loss
-        pretax_income = operating_profit + non_operating_income - non_operating_expense
-
-        st.markdown("### 📘 약식 재무상태표")
-        bs_table = pd.DataFrame([
-            {"구분": "자산", "항목": "단기매매증권(주식+예수금)", "금액": musai_securities_krw},
-            {"구분": "자산", "항목": "무형자산(저작권 순액)", "금액": amort["net_book_value"]},
-            {"구분": "자산", "항목": "자산총계", "금액": total_assets_est},
-            {"구분": "부채", "항목": "특수관계인 차입금", "금액": related_party_principal},
-            {"구분": "부채", "항목": "기보 대출", "금액": kibo_principal},
-            {"구분": "부채", "항목": "중진공 대출(잔액)", "금액": kosme["remaining_principal"]},
-            {"구분": "부채", "항목": "RCPS 조합1", "금액": rcps_1_principal},
-            {"구분": "부채", "항목": "RCPS 조합2", "금액": rcps_2_principal},
-            {"구분": "부채", "항목": "한투 증권담보대출", "금액": kis_collateral_loan_krw},
-            {"구분": "부채", "항목": "부채총계", "금액": total_liabilities},
-            {"구분": "자본", "항목": "자본(자산-부채)", "금액": equity_est},
-        ])
-        st.dataframe(bs_table.style.format({"금액": "₩{:,.0f}"}), hide_index=True, width='stretch')
-
-        st.markdown("### 📗 약식 손익계산서")
-        pl_df = pd.DataFrame([
-            {"항목": "매출액", "금액": sales_amount},
-            {"항목": "판매비와관리비", "금액": opex_amount},
-            {"항목": "영업손익", "금액": operating_profit},
-            {"항목": "이자수익", "금액": interest_income},
-            {"항목": "배당금수익", "금액": dividend_income},
-            {"항목": "단기매매증권처분이익", "금액": sec_gain},
-            {"항목": "이자비용", "금액": -interest_expense},
-            {"항목": "단기매매증권처분손실", "금액": -sec_loss},
-            {"항목": "법인세차감전이익(추정)", "금액": pretax_income},
-        ])
-        st.dataframe(pl_df.style.format({"금액": "₩{:,.0f}"}), hide_index=True, width='stretch')
-
-        st.markdown(f"**부채총계 가중평균 금리:** {weighted_avg_rate:.2f}%")
-        if kis_loan_result.get("success"):
-            st.caption(f"한투 담보대출 API 자동조회 성공: ₩{kis_collateral_loan_krw:,.0f}")
-        else:
-            st.caption("한투 담보대출 API 자동조회 실패. 하단 Modify에서 수동 보정하세요.")
-        if creon_balance.get("success"):
-            st.caption(
-                f"대신(크레온) 웹수집 반영: ₩{creon_balance.get('eval_amount_krw', 0):,.0f} "
-                f"(source: {creon_balance.get('path')}, updated: {creon_balance.get('last_updated')})"
-            )
-        else:
-            st.caption(f"대신(크레온) 웹수집 파일 미반영 (expected: {creon_balance.get('path')})")
-
-        with st.expander("⚙️ Modify (수정 입력)", expanded=False):
-            c1, c2, c3 = st.columns(3)
-            st.session_state["corp_related_party_principal"] = c1.number_input("특수관계인 차입금", min_value=0, value=int(related_party_principal), step=10_000_000)
-            st.session_state["corp_related_party_rate"] = c2.number_input("특수관계인 금리(%)", min_value=0.0, value=float(related_party_rate), step=0.1)
-            st.session_state["corp_rcps_rate"] = c3.number_input("RCPS 금리(%)", min_value=0.0, value=float(rcps_rate), step=0.1)
-
-            c4, c5, c6 = st.columns(3)
-            st.session_state["corp_rcps_1_principal"] = c4.number_input("RCPS 조합1", min_value=0, value=int(rcps_1_principal), step=10_000_000)
-            st.session_state["corp_rcps_2_principal"] = c5.number_input("RCPS 조합2", min_value=0, value=int(rcps_2_principal), step=10_000_000)
-            st.session_state["corp_kis_collateral_loan"] = c6.number_input("한투 증권담보대출", min_value=0, value=int(kis_collateral_loan_krw), step=10_000_000)
-
-            c7, c8, c9 = st.columns(3)
-            st.session_state["corp_kibo_principal"] = c7.number_input("기보 원금", min_value=0, value=int(kibo_principal), step=5_000_000)
-            st.session_state["corp_kibo_rate"] = c8.number_input("기보 금리(%)", min_value=0.0, value=float(kibo_rate), step=0.05)
-            st.session_state["corp_collateral_loan_rate"] = c9.number_input("증권담보대출 금리(%)", min_value=0.0, value=float(collateral_loan_rate), step=0.1)
-
-            c10, c11, c12 = st.columns(3)
-            st.session_state["corp_kosme_principal"] = c10.number_input("중진공 최초 원금", min_value=0, value=int(kosme_principal), step=10_000_000)
-            st.session_state["corp_kosme_rate"] = c11.number_input("중진공 금리(%)", min_value=0.0, value=float(kosme_rate), step=0.1)
-            st.session_state["corp_kosme_start"] = c12.date_input("중진공 상환 시작일", value=st.session_state["corp_kosme_start"], key="modify_kosme_start")
-
-            p1, p2, p3 = st.columns(3)
-            st.session_state["corp_sales"] = p1.number_input("매출액", min_value=0, value=int(sales_amount), step=1_000_000)
-            st.session_state["corp_opex"] = p2.number_input("판관비", min_value=0, value=int(opex_amount), step=1_000_000)
-            st.session_state["corp_interest_income"] = p3.number_input("이자수익", min_value=0, value=int(interest_income), step=100_000)
-
-            p4, p5, p6 = st.columns(3)
-            st.session_state["corp_dividend_income"] = p4.number_input("배당금수익", min_value=0, value=int(dividend_income), step=100_000)
-            st.session_state["corp_sec_gain"] = p5.number_input("증권처분이익", min_value=0, value=int(sec_gain), step=100_000)
-            st.session_state["corp_sec_loss"] = p6.number_input("증권처분손실", min_value=0, value=int(sec_loss), step=100_000)
-            st.session_state["corp_interest_expense"] = st.number_input("이자비용", min_value=0, value=int(interest_expense), step=100_000)
-
-            st.caption("※ 수정값은 세션 기준으로 즉시 반영됩니다.")
-            st.caption("크레온(대신) COM은 서버 직접 자동화 제약이 커서 별도 로컬 수집 에이전트 연동이 필요합니다.")
+        render_corp_finance_tab(df)
 
     with tab3:
-        st.subheader("📈 통합 NAV 및 벤치마크 비교")
-        st.caption("업로드 방식 대신, 스케줄러(CRON)로 누적 저장된 NAV/현금흐름 파일을 읽어 TWR을 계산합니다.")
-
-        nav_df, flow_df, nav_path, flow_path = load_nav_inputs_from_files()
-        st.caption(f"NAV 파일: `{nav_path}` | 현금흐름 파일: `{flow_path}`")
-        st.caption("※ 외화 환전은 외부 입출금이 아닌 내부 이동으로 간주하여 flow 파일에서 제외하세요.")
-
-        if nav_df.empty:
-            st.warning("NAV 스케줄 파일이 없거나 비어 있습니다. 먼저 CRON으로 일별 NAV를 적재해주세요.")
-        else:
-            required_nav_cols = {"date", "total_nav_krw"}
-            if not required_nav_cols.issubset(set(nav_df.columns)):
-                st.error("NAV 파일에는 최소 date,total_nav_krw 컬럼이 필요합니다.")
-            else:
-                if not flow_df.empty and {"date", "amount_krw", "flow_type"}.issubset(set(flow_df.columns)):
-                    flow_df["amount_krw"] = pd.to_numeric(flow_df["amount_krw"], errors="coerce").fillna(0)
-                    flow_df["flow_type"] = flow_df["flow_type"].astype(str).str.lower().str.strip()
-                    flow_df["amount_krw"] = flow_df.apply(
-                        lambda r: abs(r["amount_krw"]) if r["flow_type"] == "deposit" else -abs(r["amount_krw"]),
-                        axis=1,
-                    )
-                    flow_input = flow_df[["date", "amount_krw"]]
-                else:
-                    flow_input = pd.DataFrame(columns=["date", "amount_krw"])
-
-                twr_series_df, twr_total = calculate_twr(nav_df[["date", "total_nav_krw"]], flow_input)
-                if twr_series_df.empty:
-                    st.warning("계산 가능한 NAV 데이터가 없습니다.")
-                else:
-                    start_date = twr_series_df["date"].min()
-                    end_date = twr_series_df["date"].max()
-                    col_n1, col_n2, col_n3 = st.columns(3)
-                    col_n1.metric("기간", f"{start_date} ~ {end_date}")
-                    col_n2.metric("최종 NAV", f"₩{twr_series_df.iloc[-1]['total_nav_krw']:,.0f}")
-                    col_n3.metric("TWR 수익률", f"{twr_total:+.2%}")
-
-                    fig_nav = px.line(twr_series_df, x="date", y="cumulative_return", title="누적 NAV 수익률(TWR)")
-                    fig_nav.update_yaxes(tickformat=".2%")
-                    st.plotly_chart(fig_nav, width='stretch')
-
-                    kospi_ret = get_simple_benchmark_return("KOSPI", start_date, end_date)
-                    nasdaq_ret = get_simple_benchmark_return("NASDAQ", start_date, end_date)
-                    if kospi_ret is None:
-                        kospi_ret = st.number_input("KOSPI 기간 수익률(수동입력, %)", value=0.0, step=0.1, key="manual_kospi") / 100
-                    if nasdaq_ret is None:
-                        nasdaq_ret = st.number_input("NASDAQ 기간 수익률(수동입력, %)", value=0.0, step=0.1, key="manual_nasdaq") / 100
-
-                    benchmark_df = pd.DataFrame([
-                        {"비교대상": "통합 NAV(TWR)", "수익률": twr_total},
-                        {"비교대상": "KOSPI", "수익률": kospi_ret},
-                        {"비교대상": "NASDAQ", "수익률": nasdaq_ret},
-                    ])
-                    st.dataframe(benchmark_df.style.format({"수익률": "{:+.2%}"}), hide_index=True, width='stretch')
-
-        st.info(
-            "CRON 예시: 매일 장마감 후 collector가 `data/nav_daily.csv`, `data/nav_cashflows.csv`를 갱신하도록 구성하세요. "
-            "대신 계좌는 웹수집기(Playwright 등)에서 `CREON_WEB_BALANCE_FILE` JSON을 갱신한 뒤 서버 파일/DB로 업로드하는 구조를 권장합니다."
-        )
+        render_nav_tab()
 
 else:
     st.header("⚠️ 데이터를 로드하는 데 실패했습니다.")
@@ -0,0 +1,48 @@
+"""대시보드 공용 상수와 표 포맷 함수.
+
+Streamlit은 dashboard_app.py를 재실행할 때마다 모듈 레벨 코드까지 다시 실행하지만,
+import한 모듈은 프로세스당 한 번만 실행됩니다. 재실행마다 다시 만들 필요가 없는 값은 여기에 둡니다.
+"""
+import os
+
+import numpy as np
+
+# 키움증권 데이터 건너뛰기 옵션 (필요시)
+SKIP_KIWOOM = os.getenv("SKIP_KIWOOM", "false").lower() == "true"
+
+# 차트 색상
+MARKET_COLORS = {'국내': '#003478', '해외': '#B22234'}
+DOMESTIC_PIE = ('#003478', '#0047AB', '#4169E1', '#5B9BD5', '#6FA8DC',
+                '#93C5FD', '#A8DADC', '#B4D7E8', '#C9E4F7', '#DBEAFE')
+OVERSEAS_PIE = ('#B22234', '#DC143C', '#E63946', '#F08080', '#FA8072',
+                '#FFB6C1', '#FFC0CB', '#FFD1DC', '#FFE4E1', '#FFF0F5')
+STOCK_PIE = ('#8B9DC3', '#A8B5C7', '#9CA8B8', '#B8C5D6', '#9EAAB5',
+             '#C9D6E3', '#7B8FA3', '#A6B4C4', '#BCC9D8', '#8C9CAD')
+
+
+def _signed_krw_text(value):
+    return f"+₩{value:,.0f}" if value >= 0 else f"-₩{abs(value):,.0f}"
+
+
+# 계좌별 보유 현황/전체 종목 요약 표의 렌더링 포맷
+# 표에 없는 컬럼 키는 Styler.format이 무시합니다.
+HOLDINGS_FORMATS = {
+    '수량': '{:,.0f}',
+    '평단가': '{:,.2f}',
+    '현재가': '{:,.2f}',
+    '투자원금': '₩{:,.0f}',
+    '평가금액': '₩{:,.0f}',
+    '손익': _signed_krw_text,
+    '수익률(%)': '{:+.1f}%',
+    '비중(%)': '{:.1f}%',
+}
+
+
+def highlight_negative(col, masks):
+    """Styler.apply용: 미리 계산한 음수 마스크로 컬럼 전체의 CSS를 한 번에 만듭니다."""
+    return np.where(masks[col.name], 'color: #FF4B4B', '')
+
+
+def fmt_krw(values):
+    """원화 금액 Series를 '₩1,234' 문자열로 한 번에 포맷합니다."""
+    return '₩' + values.round().astype('int64').map('{:,}'.format)
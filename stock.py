@@ -1,14 +1,48 @@
 import os
+import base64
+import hashlib
 import json
+import logging
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Optional, Dict, List, Tuple
-import boto3
+
+try:
+    import orjson
+except ImportError:  # orjson 미설치 환경에서는 표준 json으로 동작
+    orjson = None
 
 # 상수
+log = logging.getLogger("portfolio")
+
 KST = timezone(timedelta(hours=9))
 TOKEN_BUFFER_SEC = 300  # 5분
+# 공유 세션의 풀: 호스트는 2곳(한투, 키움), 동시 요청은 잔고 조회 작업 수(최대 5개) 정도
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 10
+# 일시적 오류(429/5xx)는 같은 호출 안에서 백오프 재시도 (재실행 시 토큰부터 다시 받는 일을 줄임).
+# 응답 대기 타임아웃은 호출당 최대 20초가 누적되므로 읽기 재시도는 1회로 제한합니다.
+HTTP_RETRY = Retry(
+    total=3,
+    read=1,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "POST"]),
+    respect_retry_after_header=True,
+    raise_on_status=False,  # 재시도 후에도 실패하면 마지막 응답을 그대로 돌려 기존 오류 처리를 탐
+)
+# 잔고 응답 재사용 시간(초). 0이면 끔. 대시보드 새로고침이 짧은 간격으로 몰릴 때 같은 응답을 재사용합니다.
+BALANCE_CACHE_TTL_SEC = float(os.getenv("BALANCE_CACHE_TTL_SEC", "0"))
 
 # 디렉토리 경로 설정 (EC2 환경에서도 작동)
 try:
@@ -22,8 +56,9 @@ TOKEN_DIR.mkdir(exist_ok=True)
 
 # ==================== 유틸리티 ====================
 def split_account(account: str) -> Tuple[str, str]:
-    account = account.strip()
-    return account.split("-", 1) if "-" in account else (account[:8], account[8:])
+    # partition은 한 번의 탐색으로 구분자 유무와 양쪽 문자열을 함께 돌려줌
+    cano, sep, prdt = account.strip().partition("-")
+    return (cano, prdt) if sep else (cano[:8], cano[8:])
 
 def now_kst() -> datetime:
     return datetime.now(KST)
@@ -31,45 +66,249 @@ def now_kst() -> datetime:
 def today_kst_str() -> str:
     return now_kst().strftime("%Y%m%d")
 
+def _json_loads(content: bytes):
+    """응답 본문(bytes)을 파싱합니다. orjson이 있으면 str 디코딩 없이 바로 파싱합니다."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+def _json_dumps(obj, indent: bool = True) -> bytes:
+    """한글 그대로의 UTF-8 JSON bytes (토큰/결과 파일 저장용). indent=False면 한 줄로 만듭니다."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, default=asdict).encode("utf-8")
+
+# 파서에서 행마다 여러 번 호출되므로 이미 숫자인 값과 빈 값은 try/except 없이 바로 반환
 def safe_float(val, default=0.0) -> float:
-    try: return float(val or default)
+    if type(val) is float: return val
+    if type(val) is int: return float(val)
+    if not val: return default
+    try: return float(val)
     except (ValueError, TypeError): return default
 
 def safe_int(val, default=0) -> int:
-    try: return int(float(val or default))
+    if type(val) is int: return val
+    if not val: return default
+    # 정수 문자열("123", "-1500")은 float을 거치지 않고 바로 변환 (큰 값도 정밀도 손실 없음)
+    if type(val) is str and "." not in val:
+        try: return int(val)
+        except ValueError: pass
+    try: return int(float(val))
     except (ValueError, TypeError): return default
 
+# 응답에서 수량/금액이 0인 행을 변환 전에 걸러내기 위한 원본 값들 (0 == 0.0이라 숫자 0도 포함).
+# 튜플 비교(==)라 예상 밖의 list/dict 값이 와도 해시 오류 없이 지나갑니다.
+ZERO_RAW_VALUES = (None, "", "0", 0)
+
+# ==================== 잔고 응답 필드 매핑 ====================
+# (결과 키, 응답 필드, 변환 함수). 보유 수량 다음의 숫자 필드들로, 결과 dict의 키 순서와 같습니다.
+KIS_DOMESTIC_FIELDS = (
+    ("avg_buy_price", "pchs_avg_pric", safe_float),
+    ("current_price", "prpr", safe_float),
+    ("eval_amount", "evlu_amt", safe_int),
+    ("profit_loss", "evlu_pfls_amt", safe_int),
+    ("profit_rate", "evlu_pfls_rt", safe_float),
+)
+KIS_OVERSEAS_FIELDS = (
+    ("avg_buy_price", "avg_unpr3", safe_float),
+    ("current_price", "ovrs_now_pric1", safe_float),
+    ("eval_amount", "frcr_evlu_amt2", safe_float),
+    ("profit_loss", "evlu_pfls_amt2", safe_float),
+    ("profit_rate", "evlu_pfls_rt1", safe_float),
+)
+KIWOOM_DOMESTIC_FIELDS = (
+    ("avg_buy_price", "buy_uv", safe_float),
+    ("current_price", "cur_prc", safe_float),
+    ("eval_amount", "evlt_amt", safe_int),
+    ("profit_loss", "evltv_prft", safe_int),
+    ("profit_rate", "prft_rt", safe_float),
+)
+
+# ==================== 자산 레코드 ====================
+@dataclass(slots=True)
+class Asset:
+    """보유 자산 한 건 (종목 또는 예수금). 행마다 dict 대신 __slots__ 객체로 메모리를 줄입니다."""
+    broker: str
+    account_type: str
+    account_label: str
+    market: str
+    asset_type: str
+    ticker: Optional[str]
+    name: Optional[str]
+    quantity: int
+    avg_buy_price: float
+    current_price: float
+    eval_amount: float  # 국내(원화)는 int
+    profit_loss: float  # 국내(원화)는 int
+    profit_rate: float
+    currency: str
+
+ASSET_FIELDS = tuple(f.name for f in fields(Asset))
+
+# ==================== 토큰 저장소 ====================
+# 프로세스 전역 토큰 캐시 {토큰 이름: (토큰, 만료 시각)}.
+# 토큰은 사용자별이 아니라 계좌(앱키)별이므로 모든 세션/재실행이 같은 토큰을 공유하고,
+# 만료 전에는 토큰 DB도 다시 읽지 않습니다.
+_token_store: Dict[str, Tuple[str, float]] = {}
+_token_locks: Dict[str, threading.Lock] = {}
+_token_locks_guard = threading.Lock()
+
+def _token_lock(key: str) -> threading.Lock:
+    """토큰 키별 락. 같은 계좌의 국내/해외 조회가 동시에 토큰을 요청해도 발급은 한 번만 합니다 (발급 횟수 제한 대비)."""
+    with _token_locks_guard:
+        return _token_locks.setdefault(key, threading.Lock())
+
+# 디스크 토큰 저장소: 계좌별 JSON 파일 대신 TOKEN_DIR/tokens.db 하나에 모아 둡니다.
+# 연결은 프로세스 전체에서 하나를 공유하고, 스레드 간 접근은 _token_db_lock으로 직렬화합니다.
+_token_db: Optional[sqlite3.Connection] = None
+_token_db_lock = threading.Lock()
+
+def _get_token_db() -> sqlite3.Connection:
+    """토큰 DB 연결 (최초 호출 시 생성, 호출 측에서 _token_db_lock 보유)"""
+    global _token_db
+    if _token_db is None:
+        conn = sqlite3.connect(TOKEN_DIR / "tokens.db", check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tokens "
+            "(name TEXT PRIMARY KEY, access_token TEXT, expires_at REAL, payload BLOB)"
+        )
+        _token_db = conn
+        _import_legacy_token_files(conn)
+    return _token_db
+
+def _import_legacy_token_files(conn: sqlite3.Connection):
+    """예전 계좌별 토큰 파일(token_*.json)의 유효한 토큰을 DB로 옮기고 파일은 삭제합니다."""
+    for path in TOKEN_DIR.glob("token_*.json"):
+        try:
+            data = _json_loads(path.read_bytes())
+            token = data.get("access_token") or data.get("token")
+            expires_at = float(data.get("expires_at", 0))
+        except (OSError, ValueError, TypeError, AttributeError):
+            token = None
+        if token and expires_at > time.time():
+            with conn:
+                # DB에 이미 있는 토큰이 더 최신이므로 덮어쓰지 않음
+                conn.execute(
+                    "INSERT OR IGNORE INTO tokens (name, access_token, expires_at, payload) VALUES (?, ?, ?, ?)",
+                    (path.stem, token, expires_at, _json_dumps(data, indent=False)),
+                )
+        try:
+            path.unlink()
+        except OSError as e:
+            log.warning("[토큰 파일 삭제 오류] %s: %s", path.name, e)
+
+def _read_token_row(name: str) -> Optional[Tuple[str, float]]:
+    """저장된 (토큰, 만료 시각). 없거나 DB를 읽을 수 없으면 None"""
+    try:
+        with _token_db_lock:
+            return _get_token_db().execute(
+                "SELECT access_token, expires_at FROM tokens WHERE name = ?", (name,)
+            ).fetchone()
+    except sqlite3.Error as e:
+        log.warning("[토큰 DB 오류] %s: %s", name, e)
+        return None
+
+def _write_token_row(name: str, token: str, expires_at: float, payload: bytes):
+    try:
+        with _token_db_lock:
+            conn = _get_token_db()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO tokens (name, access_token, expires_at, payload) VALUES (?, ?, ?, ?)",
+                    (name, token, expires_at, payload),
+                )
+    except sqlite3.Error as e:
+        # 저장에 실패해도 발급받은 토큰은 메모리 캐시로 계속 사용
+        log.warning("[토큰 DB 오류] %s: %s", name, e)
+
+# ==================== HTTP 세션 ====================
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """모든 증권사 클라이언트가 공유하는 HTTP 세션.
+
+    한투 개인/법인 계좌가 같은 호스트를 쓰므로 호스트별 keep-alive 풀을 함께 사용해
+    계좌가 바뀔 때마다 TCP/TLS 연결을 새로 맺지 않습니다.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.mount(
+                "https://",
+                HTTPAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    max_retries=HTTP_RETRY,
+                ),
+            )
+            _session = session
+        return _session
+
 # ==================== Base API 클래스 ====================
 class BaseAPI:
     def __init__(self, app_key: str, app_secret: str, account_prefix: str):
         self.app_key = app_key
         self.app_secret = app_secret
-        self.token_file = TOKEN_DIR / f"token_{account_prefix}_{self.__class__.__name__}.json"
-        self._token: Optional[str] = None
+        self.token_name = f"token_{account_prefix}_{self.__class__.__name__}"
+        # (토큰, 만료 시각)을 한 번에 교체해 락 없이 읽어도 토큰과 만료 시각이 어긋나지 않게 함
+        self._token_entry: Tuple[Optional[str], float] = (None, 0.0)
+        self.session = get_session()
+        # 성공한 잔고 응답 캐시 {요청 키: (받은 시각, 응답 dict)} - BALANCE_CACHE_TTL_SEC > 0일 때만 사용
+        self._response_cache: Dict[tuple, Tuple[float, dict]] = {}
 
     def get_token(self) -> str:
-        """토큰 반환 (파일 캐시 → 신규 발급)"""
-        # 파일에서 로드
-        if self.token_file.exists():
-            try:
-                with open(self.token_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                expires_at = data.get("expires_at", 0)
-                if expires_at > now_kst().timestamp():
-                    self._token = self._extract_token(data)
-                    if self._token:
-                        print(f"[{self.token_file.name}] 토큰 재사용")
-                        return self._token
-            except (json.JSONDecodeError, KeyError):
-                pass
+        """토큰 반환 (인스턴스 → 프로세스 메모리 캐시 → 토큰 DB → 신규 발급)"""
+        # 요청마다 불리므로 유효한 토큰이 이미 있으면 락/저장소 조회 없이 바로 반환.
+        # 만료 시각은 Unix 초로 저장하므로 datetime 생성 없이 time.time()과 비교합니다.
+        token, expires_at = self._token_entry
+        if token and expires_at > time.time():
+            return token
+
+        key = self.token_name
+        with _token_lock(key):
+            cached = _token_store.get(key)
+            if cached and cached[1] > time.time():
+                self._remember_token(*cached)
+                return self._token_entry[0]
+            return self._load_or_issue_token()
+
+    def _remember_token(self, token: str, expires_at: float):
+        self._token_entry = (token, expires_at)
+        _token_store[self.token_name] = (token, expires_at)
+
+    def _load_or_issue_token(self) -> str:
+        # DB에서 로드
+        row = _read_token_row(self.token_name)
+        if row:
+            token, expires_at = row
+            if token and expires_at > time.time():
+                self._remember_token(token, expires_at)
+                log.debug("[%s] 토큰 재사용", self.token_name)
+                return self._token_entry[0]
         
         # 신규 발급
-        print(f"[{self.token_file.name}] 새 토큰 발급 중...")
+        log.debug("[%s] 새 토큰 발급 중...", self.token_name)
         return self._issue_token()
 
     def _extract_token(self, data: dict) -> Optional[str]:
         return data.get("access_token") or data.get("token")
 
+    def _fresh_response(self, key: tuple) -> Optional[dict]:
+        """BALANCE_CACHE_TTL_SEC 안에 받은 성공 응답이 있으면 반환합니다."""
+        cached = self._response_cache.get(key)
+        if cached and BALANCE_CACHE_TTL_SEC > 0 and time.time() - cached[0] < BALANCE_CACHE_TTL_SEC:
+            return cached[1]
+        return None
+
+    def _remember_response(self, key: tuple, data: dict):
+        if BALANCE_CACHE_TTL_SEC > 0:
+            self._response_cache[key] = (time.time(), data)
+
     def _issue_token(self) -> str:
         raise NotImplementedError
 
@@ -77,32 +316,54 @@ class BaseAPI:
         token = self._extract_token(data)
         if token:
             data["expires_at"] = expires_at
-            with open(self.token_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            self._token = token
-            print(f"[{self.token_file.name}] 토큰 저장 완료")
+            _write_token_row(self.token_name, token, expires_at, _json_dumps(data, indent=False))
+            self._remember_token(token, expires_at)
+            log.debug("[%s] 토큰 저장 완료", self.token_name)
 
 # ==================== 한국투자증권(KIS) ====================
+# 한투 계좌 구분(prefix) -> (계좌 유형, 계좌 표시명)
+KIS_ACCOUNT_LABELS = {
+    "P": ("개인", "조현익(한투)"),
+    "C": ("법인", "뮤사이(한투)"),
+}
+
+
 class KISApi(BaseAPI):
     BASE_URL = "https://openapi.koreainvestment.com:9443"
     
     def __init__(self, app_key: str, app_secret: str, account_no: str, account_type: str):
         super().__init__(app_key, app_secret, f"KIS_{account_type}")
         self.account_no = account_no
+        # 계좌번호(CANO)/상품코드는 조회마다 다시 나누지 않도록 생성 시 한 번만 분리
+        self.cano, self.prdt = split_account(account_no)
         self.account_type = account_type
+        # 계좌 구분에 따른 표시명 (P 외에는 법인 계좌로 취급)
+        self.account_type_label, self.account_label = KIS_ACCOUNT_LABELS.get(account_type, KIS_ACCOUNT_LABELS["C"])
+        # 자산 행마다 반복되는 공통 필드 (파서에서 {**self.base_asset_info, ...}로 사용)
+        self.base_asset_info = {
+            "broker": "한국투자증권",
+            "account_type": self.account_type_label,
+            "account_label": self.account_label,
+        }
 
     def _issue_token(self) -> str:
         url = f"{self.BASE_URL}/oauth2/tokenP"
         headers = {"content-type": "application/json"}
         body = {"grant_type": "client_credentials", "appkey": self.app_key, "appsecret": self.app_secret}
-        res = requests.post(url, headers=headers, json=body, timeout=15)
+        res = self.session.post(url, headers=headers, json=body, timeout=15)
         res.raise_for_status()
-        data = res.json()
-        expires_at = now_kst().timestamp() + int(data["expires_in"]) - TOKEN_BUFFER_SEC
+        data = _json_loads(res.content)
+        expires_at = time.time() + int(data["expires_in"]) - TOKEN_BUFFER_SEC
         self._save_token(data, expires_at)
-        return self._token
+        return self._token_entry[0]
     
     def _request(self, method: str, endpoint: str, tr_id: str, params: dict = None) -> Optional[dict]:
+        # 같은 경로라도 조회 조건(연속조회 키, 거래소 코드 등)이 다르면 다른 응답이므로 파라미터까지 키에 포함
+        cache_key = (method, endpoint, tr_id, tuple(sorted((params or {}).items())))
+        data = self._fresh_response(cache_key)
+        if data is not None:
+            return data
+
         headers = {
             "Content-Type": "application/json",
             "authorization": f"Bearer {self.get_token()}",
@@ -113,21 +374,22 @@ class KISApi(BaseAPI):
         
         url = f"{self.BASE_URL}{endpoint}"
         try:
-            res = requests.request(method, url, headers=headers, params=params, timeout=20)
+            res = self.session.request(method, url, headers=headers, params=params, timeout=20)
         except requests.exceptions.RequestException as e:
-            print(f"[KIS 네트워크 오류] {endpoint}: {e}")
+            log.warning("[KIS 네트워크 오류] %s: %s", endpoint, e)
             return None
         
         if res.status_code == 200:
-            data = res.json()
+            data = _json_loads(res.content)
             if data.get("rt_cd") == "0":
+                self._remember_response(cache_key, data)
                 return data
         
-        print(f"[KIS 오류] {endpoint}: {res.text}")
+        log.warning("[KIS 오류] %s: %s", endpoint, res.content.decode("utf-8", "replace"))
         return None
 
-    def get_domestic_balance(self) -> List[dict]:
-        cano, prdt = split_account(self.account_no)
+    def get_domestic_balance(self) -> List[Asset]:
+        cano, prdt = self.cano, self.prdt
         params = {
             "CANO": cano,
             "ACNT_PRDT_CD": prdt,
@@ -146,8 +408,8 @@ class KISApi(BaseAPI):
                            "TTTC8434R", params)
         return self._parse_domestic(data) if data else []
 
-    def get_overseas_balance(self) -> List[dict]:
-        cano, prdt = split_account(self.account_no)
+    def get_overseas_balance(self) -> List[Asset]:
+        cano, prdt = self.cano, self.prdt
         params = {
             "CANO": cano,
             "ACNT_PRDT_CD": prdt,
@@ -161,108 +423,90 @@ class KISApi(BaseAPI):
                            "CTRP6504R", params)
         return self._parse_overseas(data) if data else []
     
-    def _parse_domestic(self, data: dict) -> List[dict]:
+    def _parse_domestic(self, data: dict) -> List[Asset]:
         result = []
         output = data.get("output", data)
-
-        base_asset = {
-            "broker": "한국투자증권",
-            "account_type": "개인" if self.account_type == "P" else "법인",
-            "account_label": "조현익(한투)" if self.account_type == "P" else "뮤사이(한투)",
-        }
+        # 행마다 같은 앞부분(계좌/시장/자산 구분)은 파싱 한 번에 한 번만 만들어 복사
+        stock_base = {**self.base_asset_info, "market": "domestic", "asset_type": "stock"}
 
         for stock in output.get("output1", []):
-            qty = safe_int(stock.get("hldg_qty"))
+            raw_qty = stock.get("hldg_qty")
+            if raw_qty in ZERO_RAW_VALUES:
+                continue
+            qty = safe_int(raw_qty)
             if qty > 0:
-                asset = base_asset.copy()
-                asset.update({
-                    "market": "domestic",
-                    "asset_type": "stock",
-                    "ticker": stock.get("pdno"),
-                    "name": stock.get("prdt_name"),
-                    "quantity": qty,
-                    "avg_buy_price": safe_float(stock.get("pchs_avg_pric")),
-                    "current_price": safe_float(stock.get("prpr")),
-                    "eval_amount": safe_int(stock.get("evlu_amt")),
-                    "profit_loss": safe_int(stock.get("evlu_pfls_amt")),
-                    "profit_rate": safe_float(stock.get("evlu_pfls_rt")),
-                    "currency": "KRW"
-                })
-                result.append(asset)
+                result.append(Asset(
+                    **stock_base,
+                    ticker=stock.get("pdno"),
+                    name=stock.get("prdt_name"),
+                    quantity=qty,
+                    **{key: conv(stock.get(src)) for key, src, conv in KIS_DOMESTIC_FIELDS},
+                    currency="KRW"
+                ))
         
         if output.get("output2"):
             cash_list = output.get("output2", [])
             cash_amt = safe_int(cash_list[0].get("nxdy_excc_amt"))
             if cash_amt > 0:
-                asset = base_asset.copy()
-                asset.update({
-                    "market": "domestic",
-                    "asset_type": "cash",
-                    "ticker": "KRW",
-                    "name": "원화 예수금",
-                    "quantity": 1,
-                    "avg_buy_price": cash_amt,
-                    "current_price": cash_amt,
-                    "eval_amount": cash_amt,
-                    "profit_loss": 0,
-                    "profit_rate": 0.0,
-                    "currency": "KRW"
-                })
-                result.append(asset)
+                result.append(Asset(
+                    **self.base_asset_info,
+                    market="domestic",
+                    asset_type="cash",
+                    ticker="KRW",
+                    name="원화 예수금",
+                    quantity=1,
+                    avg_buy_price=cash_amt,
+                    current_price=cash_amt,
+                    eval_amount=cash_amt,
+                    profit_loss=0,
+                    profit_rate=0.0,
+                    currency="KRW"
+                ))
         
         return result
     
-    def _parse_overseas(self, data: dict) -> List[dict]:
+    def _parse_overseas(self, data: dict) -> List[Asset]:
         result = []
+        stock_base = {**self.base_asset_info, "market": "overseas", "asset_type": "stock"}
+        cash_base = {**self.base_asset_info, "market": "overseas", "asset_type": "cash"}
         
         for stock in data.get("output1", []):
-            qty = safe_int(stock.get("ccld_qty_smtl1"))
+            raw_qty = stock.get("ccld_qty_smtl1")
+            if raw_qty in ZERO_RAW_VALUES:
+                continue
+            qty = safe_int(raw_qty)
             if qty > 0:
-                currency = stock.get("buy_crcy_cd") or "USD"
-                avg_buy_price = safe_float(stock.get("avg_unpr3"))
-                if avg_buy_price == 0:
-                    avg_buy_price = safe_float(stock.get("pchs_avg_pric"))
-                
-                profit_loss_raw = safe_float(stock.get("evlu_pfls_amt2"))
-                profit_rate_raw = safe_float(stock.get("evlu_pfls_rt1"))
-                
-                result.append({
-                    "broker": "한국투자증권",
-                    "account_type": "개인" if self.account_type == "P" else "법인",
-                    "account_label": "조현익(한투)" if self.account_type == "P" else "뮤사이(한투)",
-                    "market": "overseas",
-                    "asset_type": "stock",
-                    "ticker": stock.get("pdno"),
-                    "name": stock.get("prdt_name"),
-                    "quantity": qty,
-                    "avg_buy_price": avg_buy_price,
-                    "current_price": safe_float(stock.get("ovrs_now_pric1")),
-                    "eval_amount": safe_float(stock.get("frcr_evlu_amt2")),
-                    "profit_loss": profit_loss_raw,
-                    "profit_rate": profit_rate_raw,
-                    "currency": currency
-                })
+                asset = Asset(
+                    **stock_base,
+                    ticker=stock.get("pdno"),
+                    name=stock.get("prdt_name"),
+                    quantity=qty,
+                    **{key: conv(stock.get(src)) for key, src, conv in KIS_OVERSEAS_FIELDS},
+                    currency=stock.get("buy_crcy_cd") or "USD"
+                )
+                if asset.avg_buy_price == 0:
+                    asset.avg_buy_price = safe_float(stock.get("pchs_avg_pric"))
+                result.append(asset)
         
         for cash in data.get("output2", []):
-            amt = safe_float(cash.get("frcr_dncl_amt_2"))
+            raw_amt = cash.get("frcr_dncl_amt_2")
+            if raw_amt in ZERO_RAW_VALUES:
+                continue
+            amt = safe_float(raw_amt)
             ccy = cash.get("crcy_cd") or "USD"
             if amt > 0:
-                result.append({
-                    "broker": "한국투자증권",
-                    "account_type": "개인" if self.account_type == "P" else "법인",
-                    "account_label": "조현익(한투)" if self.account_type == "P" else "뮤사이(한투)",
-                    "market": "overseas",
-                    "asset_type": "cash",
-                    "ticker": ccy,
-                    "name": f"{ccy} 예수금",
-                    "quantity": 1,
-                    "avg_buy_price": amt,
-                    "current_price": amt,
-                    "eval_amount": amt,
-                    "profit_loss": 0,
-                    "profit_rate": 0.0,
-                    "currency": ccy
-                })
+                result.append(Asset(
+                    **cash_base,
+                    ticker=ccy,
+                    name=f"{ccy} 예수금",
+                    quantity=1,
+                    avg_buy_price=amt,
+                    current_price=amt,
+                    eval_amount=amt,
+                    profit_loss=0,
+                    profit_rate=0.0,
+                    currency=ccy
+                ))
         
         return result
 
@@ -273,6 +517,11 @@ class KiwoomAPI(BaseAPI):
     def __init__(self, app_key: str, app_secret: str, account_no: str):
         super().__init__(app_key, app_secret, "KIWOOM_C")
         self.account_no = account_no
+        self.base_asset_info = {
+            "broker": "키움증권",
+            "account_type": "법인",
+            "account_label": "뮤사이(키움)",
+        }
 
     def _extract_token(self, data: dict) -> Optional[str]:
         return data.get("token") or data.get("access_token")
@@ -286,11 +535,11 @@ class KiwoomAPI(BaseAPI):
             "secretkey": self.app_secret
         }
         
-        res = requests.post(url, headers=headers, json=body, timeout=20)
+        res = self.session.post(url, headers=headers, json=body, timeout=20)
         res.raise_for_status()
-        data = res.json()
+        data = _json_loads(res.content)
         
-        expires_at = now_kst().timestamp() + 1800
+        expires_at = time.time() + 1800
         if "expires_dt" in data:
             try:
                 dt = datetime.strptime(data["expires_dt"], "%Y%m%d%H%M%S").replace(tzinfo=KST)
@@ -300,9 +549,15 @@ class KiwoomAPI(BaseAPI):
         
         expires_at -= TOKEN_BUFFER_SEC
         self._save_token(data, expires_at)
-        return self._token
+        return self._token_entry[0]
+
+    def get_domestic_balance(self, qry_dt: str = None) -> List[Asset]:
+        body = {"qry_dt": qry_dt or today_kst_str()}
+        cache_key = ("ka01690", body["qry_dt"])
+        raw_data = self._fresh_response(cache_key)
+        if raw_data is not None:
+            return self._parse_domestic(raw_data)
 
-    def get_domestic_balance(self, qry_dt: str = None) -> List[dict]:
         url = f"{self.BASE_URL}/api/dostk/acnt"
         headers = {
             "Content-Type": "application/json;charset=UTF-8",
@@ -311,89 +566,181 @@ class KiwoomAPI(BaseAPI):
             "next-key": "",
             "api-id": "ka01690"
         }
-        body = {"qry_dt": qry_dt or today_kst_str()}
         
-        res = requests.post(url, headers=headers, json=body, timeout=20)
+        res = self.session.post(url, headers=headers, json=body, timeout=20)
         res.raise_for_status()
-        raw_data = res.json()
+        raw_data = _json_loads(res.content)
+        if raw_data.get("return_code") == 0:
+            self._remember_response(cache_key, raw_data)
         
         return self._parse_domestic(raw_data)
 
-    @staticmethod
-    def _parse_domestic(data: dict) -> List[dict]:
+    def _parse_domestic(self, data: dict) -> List[Asset]:
         result = []
         
         if data.get("return_code") != 0:
-            print(f"[키움 오류] {data.get('return_msg')}")
+            log.warning("[키움 오류] %s", data.get("return_msg"))
             return result
         
+        stock_base = {**self.base_asset_info, "market": "domestic", "asset_type": "stock"}
         for stock in data.get("day_bal_rt", []):
-            qty = safe_int(stock.get("rmnd_qty"))
+            raw_qty = stock.get("rmnd_qty")
+            if raw_qty in ZERO_RAW_VALUES:
+                continue
+            qty = safe_int(raw_qty)
             if qty > 0:
                 name = stock.get("stk_nm", stock.get("stk_cd", "알 수 없음"))
                 
-                result.append({
-                    "broker": "키움증권",
-                    "account_type": "법인",
-                    "account_label": "뮤사이(키움)",
-                    "market": "domestic",
-                    "asset_type": "stock",
-                    "ticker": stock.get("stk_cd"),
-                    "name": name,
-                    "quantity": qty,
-                    "avg_buy_price": safe_float(stock.get("buy_uv")),
-                    "current_price": safe_float(stock.get("cur_prc")),
-                    "eval_amount": safe_int(stock.get("evlt_amt")),
-                    "profit_loss": safe_int(stock.get("evltv_prft")),
-                    "profit_rate": safe_float(stock.get("prft_rt")),
-                    "currency": "KRW"
-                })
+                result.append(Asset(
+                    **stock_base,
+                    ticker=stock.get("stk_cd"),
+                    name=name,
+                    quantity=qty,
+                    **{key: conv(stock.get(src)) for key, src, conv in KIWOOM_DOMESTIC_FIELDS},
+                    currency="KRW"
+                ))
         
-        dbst_bal = safe_int(data.get("dbst_bal"))
+        raw_bal = data.get("dbst_bal")
+        dbst_bal = 0 if raw_bal in ZERO_RAW_VALUES else safe_int(raw_bal)
         if dbst_bal > 0:
-            result.append({
-                "broker": "키움증권",
-                "account_type": "법인",
-                "account_label": "뮤사이(키움)",
-                "market": "domestic",
-                "asset_type": "cash",
-                "ticker": "KRW",
-                "name": "원화 예수금",
-                "quantity": 1,
-                "avg_buy_price": dbst_bal,
-                "current_price": dbst_bal,
-                "eval_amount": dbst_bal,
-                "profit_loss": 0,
-                "profit_rate": 0.0,
-                "currency": "KRW"
-            })
+            result.append(Asset(
+                **self.base_asset_info,
+                market="domestic",
+                asset_type="cash",
+                ticker="KRW",
+                name="원화 예수금",
+                quantity=1,
+                avg_buy_price=dbst_bal,
+                current_price=dbst_bal,
+                eval_amount=dbst_bal,
+                profit_loss=0,
+                profit_rate=0.0,
+                currency="KRW"
+            ))
         
         return result
 
 # ==================== 메인 실행 ====================
-def load_account_config(prefix: str, broker: str) -> Optional[Dict]:
-    """AWS Parameter Store에서 인증 정보를 로드합니다."""
+def _ssm_param_names(prefix: str, broker: str) -> Dict[str, str]:
     key_suffix = "HANTOO" if broker == "kis" else "KIWOOM"
-    param_names = {
+    return {
         "app_key": f"/stock-dashboard/{prefix}_{key_suffix}_APP_KEY",
         "app_secret": f"/stock-dashboard/{prefix}_{key_suffix}_APP_SECRET",
         "account_no": f"/stock-dashboard/{prefix}_{key_suffix}_ACCOUNT_NO"
     }
 
+# 사용하는 계좌 조합 (prefix, broker): 한투 개인/법인, 키움 법인
+ACCOUNT_SPECS: Tuple[Tuple[str, str], ...] = (("P", "kis"), ("C", "kis"), ("C", "kiwoom"))
+
+# 파라미터 이름은 import 시 한 번만 만들어 둠
+SSM_PARAM_NAMES = {spec: _ssm_param_names(*spec) for spec in ACCOUNT_SPECS}
+
+# SSM 설정 디스크 캐시 (선택). CONFIG_CACHE_KEY 환경변수가 있고 cryptography가 설치된 경우에만
+# 복호화된 설정을 Fernet으로 암호화해 저장하고, TTL 동안은 SSM을 호출하지 않습니다.
+CONFIG_CACHE_FILE = DIR_PATH / ".ssm_cache.bin"
+CONFIG_CACHE_TTL_SEC = 6 * 3600  # 6시간
+
+def _config_cipher():
+    secret = os.getenv("CONFIG_CACHE_KEY")
+    if not secret:
+        return None
+    try:
+        from cryptography.fernet import Fernet
+    except ImportError:
+        return None
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(secret.encode("utf-8")).digest()))
+
+def _load_cached_configs(cipher) -> Dict[Tuple[str, str], Dict]:
+    """캐시 파일의 설정을 {(prefix, broker): 설정}으로 반환. 없거나 만료/손상이면 빈 dict.
+
+    만료는 설정별 cached_at(SSM에서 받은 시각) 기준이라, 다른 계좌를 다시 받으며 파일을
+    새로 써도 기존 설정의 TTL은 늘어나지 않습니다.
+    """
+    from cryptography.fernet import InvalidToken
+
+    if not CONFIG_CACHE_FILE.exists():
+        return {}
     try:
-        ssm_client = boto3.client('ssm', region_name='ap-northeast-2')
-        response = ssm_client.get_parameters(
-            Names=list(param_names.values()),
+        # Fernet 토큰에는 생성 시각이 들어 있어 ttl을 넘기면 복호화가 실패합니다 (만료 처리)
+        raw = cipher.decrypt(CONFIG_CACHE_FILE.read_bytes(), ttl=CONFIG_CACHE_TTL_SEC)
+        configs = json.loads(raw)
+    except (OSError, InvalidToken, json.JSONDecodeError, UnicodeDecodeError):
+        return {}
+    now = time.time()
+    return {
+        (c["prefix"], c["broker"]): c
+        for c in configs
+        if now - c.get("cached_at", 0) < CONFIG_CACHE_TTL_SEC
+    }
+
+def _save_cached_configs(cipher, configs: Dict[Tuple[str, str], Dict]):
+    payload = json.dumps(list(configs.values()), ensure_ascii=False).encode("utf-8")
+    # 처음부터 0600으로 만든 임시 파일에 쓰고 교체 (다른 권한으로 파일이 노출되는 순간이 없도록)
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=CONFIG_CACHE_FILE.parent, prefix=CONFIG_CACHE_FILE.name, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(cipher.encrypt(payload))
+        os.replace(tmp_path, CONFIG_CACHE_FILE)
+    except OSError as e:
+        log.warning("[SSM 캐시 저장 오류] %s", e)
+        if tmp_path:
+            Path(tmp_path).unlink(missing_ok=True)
+
+_BOTO3_SESSION = None
+_SSM_CLIENT = None
+_ssm_lock = threading.Lock()
+
+def _ssm():
+    """프로세스 전역 SSM 클라이언트. botocore 서비스 모델 로드는 최초 1회만 합니다.
+
+    boto3는 import만으로 수백 ms가 걸려 실제로 SSM을 조회할 때만 로드하고, 클라이언트 생성은
+    스레드 안전하지 않아 락 안에서 만듭니다 (생성된 클라이언트 호출은 스레드 안전).
+    """
+    global _BOTO3_SESSION, _SSM_CLIENT
+    with _ssm_lock:
+        if _SSM_CLIENT is None:
+            import boto3
+
+            _BOTO3_SESSION = boto3.session.Session()
+            _SSM_CLIENT = _BOTO3_SESSION.client('ssm', region_name='ap-northeast-2')
+        return _SSM_CLIENT
+
+def load_all_account_configs(specs=ACCOUNT_SPECS) -> Dict[Tuple[str, str], Optional[Dict]]:
+    """여러 계좌의 인증 정보를 AWS Parameter Store에서 한 번의 get_parameters 호출로 로드합니다.
+
+    반환값은 {(prefix, broker): 설정 또는 None}. 계좌 3개 × 3개 = 9개로 호출당 한도(10개) 안입니다.
+    암호화 디스크 캐시가 켜져 있고 요청한 계좌가 모두 캐시에 있으면 SSM을 호출하지 않습니다.
+    """
+    specs = list(specs)
+    cipher = _config_cipher()
+    cached = _load_cached_configs(cipher) if cipher else {}
+    if all(spec in cached for spec in specs):
+        return {spec: cached[spec] for spec in specs}
+
+    names_by_spec = {
+        spec: SSM_PARAM_NAMES.get(spec) or _ssm_param_names(*spec) for spec in specs
+    }
+
+    try:
+        response = _ssm().get_parameters(
+            Names=[name for names in names_by_spec.values() for name in names.values()],
             WithDecryption=True
         )
-
         retrieved_params = {p['Name']: p['Value'] for p in response['Parameters']}
+    except Exception as e:
+        log.error("[%s] AWS Parameter Store에서 설정 로드 중 오류 발생: %s",
+                  ",".join(prefix for prefix, _ in specs), e)
+        return {spec: None for spec in specs}
 
-        if len(retrieved_params) != len(param_names):
-            print(f"[{prefix}] 일부 파라미터를 찾을 수 없습니다.")
-            return None
+    configs = {}
+    for (prefix, broker), param_names in names_by_spec.items():
+        if not all(name in retrieved_params for name in param_names.values()):
+            log.warning("[%s] 일부 파라미터를 찾을 수 없습니다.", prefix)
+            configs[(prefix, broker)] = None
+            continue
 
-        return {
+        configs[(prefix, broker)] = {
             "app_key": retrieved_params[param_names["app_key"]],
             "app_secret": retrieved_params[param_names["app_secret"]],
             "account_no": retrieved_params[param_names["account_no"]],
@@ -401,55 +748,156 @@ def load_account_config(prefix: str, broker: str) -> Optional[Dict]:
             "broker": broker
         }
 
-    except Exception as e:
-        print(f"[{prefix}] AWS Parameter Store에서 설정 로드 중 오류 발생: {e}")
-        return None
+    if cipher:
+        # 이번에 SSM에서 받은 설정만 받은 시각을 새로 기록 (캐시에서 온 설정은 원래 시각 유지)
+        now = time.time()
+        fresh = {spec: {**config, "cached_at": now} for spec, config in configs.items() if config}
+        if fresh:
+            _save_cached_configs(cipher, {**cached, **fresh})
+    return configs
+
+def load_account_config(prefix: str, broker: str) -> Optional[Dict]:
+    """AWS Parameter Store에서 인증 정보를 로드합니다."""
+    return load_all_account_configs([(prefix, broker)])[(prefix, broker)]
+
+# 프로세스 단위 클라이언트 캐시: 세션(keep-alive 풀)과 메모리 토큰을 조회마다 다시 만들지 않음
+_clients: Dict[Tuple[str, str], BaseAPI] = {}
+_clients_lock = threading.Lock()
+
+
+def _get_clients(specs) -> Dict[Tuple[str, str], Optional[BaseAPI]]:
+    """{(prefix, broker): 클라이언트 또는 None}. 아직 없는 클라이언트의 설정은 SSM 한 번으로 모아 읽습니다."""
+    specs = list(specs)
+    with _clients_lock:
+        clients = {spec: _clients.get(spec) for spec in specs}
+
+    missing = [spec for spec, client in clients.items() if client is None]
+    if not missing:
+        return clients
+
+    # 설정 로드 실패(None)는 캐시하지 않아 다음 호출에서 다시 시도합니다.
+    for (prefix, broker), config in load_all_account_configs(missing).items():
+        if not config:
+            continue
+        if broker == "kis":
+            client = KISApi(config["app_key"], config["app_secret"], config["account_no"], prefix)
+        else:
+            client = KiwoomAPI(config["app_key"], config["app_secret"], config["account_no"])
+        with _clients_lock:
+            clients[(prefix, broker)] = _clients.setdefault((prefix, broker), client)
+    return clients
 
-def collect_all_assets(skip_kiwoom=False):
-    """모든 증권사 API를 호출하여 통합된 자산 목록을 반환하는 함수."""
-    all_assets = []
+
+def _get_client(broker: str, prefix: str) -> Optional[BaseAPI]:
+    return _get_clients([(prefix, broker)])[(prefix, broker)]
+
+
+def get_kis_client(prefix: str) -> Optional["KISApi"]:
+    """한국투자증권 클라이언트 (P: 개인, C: 법인). 설정이 없으면 None."""
+    return _get_client("kis", prefix)
+
+
+def get_kiwoom_client() -> Optional["KiwoomAPI"]:
+    """키움증권(법인) 클라이언트. 설정이 없으면 None."""
+    return _get_client("kiwoom", "C")
+
+
+def collect_all_assets(skip_kiwoom=False) -> List[Asset]:
+    """모든 증권사 API를 호출하여 통합된 자산(Asset) 목록을 반환하는 함수.
+
+    클라이언트 생성(최초 1회, 모든 계좌 설정을 SSM 한 번으로 조회)은 먼저 하고, 네트워크 대기가
+    대부분인 잔고 조회(계좌별 국내/해외)는 모두 스레드로 동시에 실행합니다.
+    결과 순서는 한투 개인(국내→해외) → 한투 법인(국내→해외) → 키움 순서를 유지합니다.
+    """
+    tasks = []
+    specs = [spec for spec in ACCOUNT_SPECS if not (skip_kiwoom and spec[1] == "kiwoom")]
+    clients = _get_clients(specs)
     
     # 한국투자증권 (개인, 법인)
     for prefix in ["P", "C"]:
-        config = load_account_config(prefix, "kis")
-        if not config:
+        api = clients[(prefix, "kis")]
+        if not api:
             continue
         
-        api = KISApi(
-            config["app_key"], 
-            config["app_secret"], 
-            config["account_no"], 
-            prefix
-        )
-        
-        label = f"한국투자증권({'개인' if api.account_type == 'P' else '법인'})"
-        print(f"[{label}] 데이터 수집 중...")
-
-        try:
-            all_assets.extend(api.get_domestic_balance())
-            all_assets.extend(api.get_overseas_balance())
-        except Exception as e:
-            print(f"[오류] {label} 데이터 수집 실패: {e}")
+        label = f"한국투자증권({api.account_type_label})"
+        log.info("[%s] 데이터 수집 중...", label)
+        tasks.append((f"{label} 국내", api.get_domestic_balance))
+        tasks.append((f"{label} 해외", api.get_overseas_balance))
     
     # 키움증권 (법인)
     if skip_kiwoom:
-        print("[키움증권(법인)] IP 제한으로 인해 스킵됨")
+        log.info("[키움증권(법인)] IP 제한으로 인해 스킵됨")
     else:
-        kiw_config = load_account_config("C", "kiwoom")
-        if kiw_config:
-            api = KiwoomAPI(
-                kiw_config["app_key"], 
-                kiw_config["app_secret"],
-                kiw_config["account_no"]
-            )
+        api = clients[("C", "kiwoom")]
+        if api:
+            log.info("[키움증권(법인)] 데이터 수집 중...")
+            tasks.append(("키움증권(법인)", api.get_domestic_balance))
+
+    if not tasks:
+        return []
 
-            print(f"[키움증권(법인)] 데이터 수집 중...")
+    # 끝나는 대로 결과를 받되, 자리(인덱스)에 넣어 계좌 순서를 유지합니다.
+    # 조회 하나가 실패해도 다른 조회 결과에는 영향을 주지 않습니다.
+    results: List[List[Asset]] = [[] for _ in tasks]
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = {executor.submit(fetch): i for i, (_, fetch) in enumerate(tasks)}
+        for future in as_completed(futures):
+            i = futures[future]
             try:
-                all_assets.extend(api.get_domestic_balance())
+                results[i] = future.result()
             except Exception as e:
-                print(f"[오류] 키움증권 데이터 수집 실패: {e}")
+                log.error("[오류] %s 데이터 수집 실패: %s", tasks[i][0], e)
                 
-    return all_assets
+    return [asset for assets in results for asset in assets]
+
+
+# 자산 필드별 dtype. 여기에 없는 컬럼(eval_amount 등)은 값에서 추론합니다
+# (국내 원화는 int, 해외는 float이 섞이므로 pandas와 같은 규칙을 따름).
+ASSET_DTYPES = {
+    "quantity": "int64",
+    "avg_buy_price": "float64",
+    "current_price": "float64",
+    "profit_rate": "float64",
+    "broker": object,
+    "account_type": object,
+    "account_label": object,
+    "market": object,
+    "asset_type": object,
+    "ticker": object,
+    "name": object,
+    "currency": object,
+}
+
+def assets_to_columns(assets: List[Asset], columns=None) -> Dict[str, np.ndarray]:
+    """자산 목록(행 단위 Asset)을 컬럼별 NumPy 배열로 변환합니다.
+
+    합계/환산 같은 집계를 행 루프 대신 배열 연산으로 하거나, DataFrame을 dtype 추론 없이
+    바로 만들 때 사용합니다. columns를 주면 해당 컬럼만 그 순서대로 만듭니다.
+    """
+    if columns is None:
+        columns = ASSET_FIELDS
+    return {
+        col: np.asarray([getattr(asset, col) for asset in assets], dtype=ASSET_DTYPES.get(col))
+        for col in columns
+    }
+
+
+def totals_by_currency(columns: Dict[str, np.ndarray]) -> Dict[str, Dict[str, float]]:
+    """통화별 평가금액/손익 합계와 수익률(%)을 계산합니다 (assets_to_columns 결과 사용).
+
+    통화 코드를 정수 인덱스로 바꾼 뒤 np.bincount 한 번씩으로 그룹 합을 구하므로
+    행 수와 무관하게 Python 루프는 통화 개수만큼만 돕니다.
+    """
+    currencies, codes = np.unique(columns["currency"].astype(str), return_inverse=True)
+    n = len(currencies)
+    eval_sum = np.bincount(codes, weights=columns["eval_amount"].astype(np.float64), minlength=n)
+    pl_sum = np.bincount(codes, weights=columns["profit_loss"].astype(np.float64), minlength=n)
+    principal = eval_sum - pl_sum
+    rate = np.divide(pl_sum, principal, out=np.zeros(n), where=principal != 0) * 100
+    return {
+        ccy: {"eval_amount": float(e), "profit_loss": float(p), "profit_rate": float(r)}
+        for ccy, e, p, r in zip(currencies.tolist(), eval_sum, pl_sum, rate)
+    }
 
 
 def get_kis_collateral_loan_balance(prefix: str = "C") -> Dict[str, float]:
@@ -458,12 +906,11 @@ def get_kis_collateral_loan_balance(prefix: str = "C") -> Dict[str, float]:
     - API 응답 스키마가 계좌/권한별로 다를 수 있어, 후보 필드를 순차 탐색합니다.
     - 조회 실패 시 {"loan_balance": 0.0, "success": False} 반환.
     """
-    config = load_account_config(prefix, "kis")
-    if not config:
+    api = get_kis_client(prefix)
+    if not api:
         return {"loan_balance": 0.0, "success": False}
 
-    api = KISApi(config["app_key"], config["app_secret"], config["account_no"], prefix)
-    cano, prdt = split_account(config["account_no"])
+    cano, prdt = api.cano, api.prdt
     params = {
         "CANO": cano,
         "ACNT_PRDT_CD": prdt,
@@ -545,28 +992,49 @@ def load_creon_web_balance(path: str = None) -> Dict[str, float]:
             "path": str(p),
         }
     except Exception as e:
-        print(f"[CREON 웹수집 로드 오류] {e}")
+        log.warning("[CREON 웹수집 로드 오류] %s", e)
         return {"success": False, "eval_amount_krw": 0.0, "cash_krw": 0.0, "last_updated": None, "path": str(path)}
 
+def write_portfolio_json(path: Path, header: Dict, assets: List[Asset]):
+    """header 필드와 assets 배열을 JSON 파일로 씁니다.
+
+    문서 전체를 한 번에 직렬화하지 않고 자산을 한 줄에 하나씩 스트리밍으로 기록하므로
+    메모리에는 자산 하나 분량의 버퍼만 올라갑니다. 결과는 그대로 유효한 JSON입니다.
+    """
+    with open(path, "wb") as f:
+        f.write(b"{\n")
+        for key, value in header.items():
+            f.write(b"  " + _json_dumps(key) + b": " + _json_dumps(value) + b",\n")
+        f.write(b'  "assets": [')
+        for i, asset in enumerate(assets):
+            f.write((b",\n    " if i else b"\n    ") + _json_dumps(asset, indent=False))
+        f.write(b"\n  ]\n}\n" if assets else b"]\n}\n")
+
 def main():
     """
     로컬에서 직접 실행할 때만 사용되는 함수 (테스트용).
     수집된 데이터를 portfolio_unified.json 파일로 저장합니다.
     """
+    logging.basicConfig(
+        level=os.getenv("PORTFOLIO_LOG_LEVEL", "WARNING").upper(),
+        format="%(message)s",
+    )
     print("=" * 60 + "\n로컬 데이터 수집 시작\n" + "=" * 60)
     assets = collect_all_assets()
+    now = now_kst()
     
-    output_data = {
-        "last_updated": datetime.now(KST).isoformat(),
-        "last_updated_readable": datetime.now(KST).strftime('%Y-%m-%d %H:%M:%S'),
-        "assets": assets
+    header = {
+        "last_updated": now.isoformat(),
+        "last_updated_readable": now.strftime('%Y-%m-%d %H:%M:%S'),
     }
     
     output_file = DIR_PATH / "portfolio_unified.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, ensure_ascii=False, indent=2)
+    write_portfolio_json(output_file, header, assets)
     
     print(f"\n총 {len(assets)}건 수집 완료 → {output_file}")
+    for ccy, total in totals_by_currency(assets_to_columns(assets)).items():
+        print(f"  [{ccy}] 평가금액 {total['eval_amount']:,.2f} / 손익 {total['profit_loss']:,.2f} "
+              f"({total['profit_rate']:+.2f}%)")
 
 if __name__ == "__main__":
     main()